@@ -1,341 +1,734 @@
-import tkinter as tk
-from tkinter import messagebox
-import os
-from tkinter import ttk
-
-# File to store the text
-DATA_FILE = "clipboard_data.txt"
-
-def load_data():
-    """Load text data from file."""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as file:
-            return [line.strip() for line in file.readlines()]
-    return []
-
-def save_data(data):
-    """Save text data to file."""
-    with open(DATA_FILE, "w") as file:
-        file.writelines(f"{line}\n" for line in data)
-
-def add_text():
-    """Add text from input box to the list."""
-    text = input_box.get("1.0", tk.END).strip()
-    if not text:
-        messagebox.showwarning("Input Error", "Please enter some text!")
-        return
-
-    # Add to the list and update the display
-    items.append(text)
-    save_data(items)
-    refresh_list()
-    input_box.delete("1.0", tk.END)
-
-def search_items(event=None):
-    """Search and sort items based on search text."""
-    search_text = search_var.get().lower()
-    
-    # Sort items based on similarity to search text
-    sorted_items = []
-    sorted_indices = []  # Keep track of original indices
-    
-    if search_text:
-        # Add items that start with search text first
-        for i, item in enumerate(items):
-            if item.lower().startswith(search_text):
-                sorted_items.append(item)
-                sorted_indices.append(i)
-                
-        # Then add items that contain search text
-        for i, item in enumerate(items):
-            if search_text in item.lower() and not item.lower().startswith(search_text):
-                sorted_items.append(item)
-                sorted_indices.append(i)
-                
-        # Finally add remaining items
-        for i, item in enumerate(items):
-            if i not in sorted_indices:
-                sorted_items.append(item)
-                sorted_indices.append(i)
-    else:
-        sorted_items = items.copy()
-        sorted_indices = list(range(len(items)))
-    
-    # Refresh display with sorted items and their indices
-    refresh_list(sorted_items, sorted_indices)
-
-def refresh_list(display_items=None, display_indices=None):
-    """Refresh the listbox with updated items."""
-    if display_items is None:
-        display_items = items
-        display_indices = list(range(len(items)))
-        
-    for widget in items_frame.winfo_children():
-        widget.destroy()
-    
-    check_vars.clear()
-    
-    for i, (item, orig_index) in enumerate(zip(display_items, display_indices)):
-        var = tk.BooleanVar()
-        # Set checkbox state based on whether item is in selected_items
-        if item in selected_items:
-            var.set(True)
-        checkbox = tk.Checkbutton(items_frame, text=item, variable=var, 
-                                command=lambda idx=orig_index, v=var: toggle_item(idx, v))
-        checkbox.pack(anchor="w")
-        check_vars.append(var)
-
-def toggle_item(index, var):
-    """Update the selected text display when a checkbox is toggled."""
-    if var.get():
-        selected_items.add((items[index], len(selected_items) + 1))
-    else:
-        # Remove the item and reindex remaining items
-        selected_items.discard(next(item for item in selected_items if item[0] == items[index]))
-        # Reindex remaining items
-        selected_items_list = sorted(selected_items, key=lambda x: x[1])
-        selected_items.clear()
-        selected_items.update((item[0], i+1) for i, item in enumerate(selected_items_list))
-    update_selected_panel()
-
-def update_selected_panel():
-    """Update the panel displaying selected text."""
-    # Sort items by their selection order
-    sorted_items = sorted(selected_items, key=lambda x: x[1])
-    
-    # Add serial numbers to selected items based on selection order
-    numbered_items = [f"{item[1]}. {item[0]}" for item in sorted_items]
-    
-    # Add the hardcoded message at the end
-    message = "\nWe can submit any document or image in the next query, if required. Please consider this."
-    
-    # Join all items with numbers and add message
-    selected_text = "\n".join(numbered_items) + message
-    
-    selected_panel.config(state="normal")
-    selected_panel.delete("1.0", tk.END)
-    selected_panel.insert("1.0", selected_text)
-    selected_panel.config(state="disabled")
-
-def clear_checkboxes():
-    """Clear all selected checkboxes."""
-    for var in check_vars:
-        var.set(False)
-    selected_items.clear()
-    update_selected_panel()
-
-def copy_selected_text():
-    """Copy selected text to clipboard."""
-    selected_panel.config(state="normal")
-    text = selected_panel.get("1.0", tk.END)
-    root.clipboard_clear()
-    root.clipboard_append(text)
-    selected_panel.config(state="disabled")
-    messagebox.showinfo("Success", "Text copied to clipboard!")
-
-def on_double_click(event):
-    """Handle double click on a list item."""
-    # Get the clicked widget
-    widget = event.widget
-    
-    # Get the text of the clicked item
-    if isinstance(widget, tk.Checkbutton):
-        item_text = widget.cget("text")
-        index = items.index(item_text)
-        
-        # Create popup dialog
-        popup = tk.Toplevel(root)
-        popup.title("Edit/Delete Item")
-        popup.geometry("400x250")
-        popup.transient(root)
-        
-        # Add text widget
-        edit_text = tk.Text(popup, height=5, width=40)
-        edit_text.pack(padx=10, pady=10)
-        edit_text.insert("1.0", item_text)
-        
-        def save_changes():
-            new_text = edit_text.get("1.0", "end-1c")
-            if new_text.strip():
-                items[index] = new_text
-                # Update selected items if the edited item was selected
-                if item_text in [item[0] for item in selected_items]:
-                    order = next(item[1] for item in selected_items if item[0] == item_text)
-                    selected_items.discard(next(item for item in selected_items if item[0] == item_text))
-                    selected_items.add((new_text, order))
-                save_data(items)
-                refresh_list()
-                update_selected_panel()
-                popup.destroy()
-            else:
-                messagebox.showwarning("Warning", "Text cannot be empty.")
-        
-        def delete_item_popup():
-            if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this item?"):
-                items.remove(item_text)
-                # Remove from selected items if it was selected
-                if item_text in [item[0] for item in selected_items]:
-                    selected_items.discard(next(item for item in selected_items if item[0] == item_text))
-                save_data(items)
-                refresh_list()
-                update_selected_panel()
-                popup.destroy()
-        
-        # Add buttons
-        button_frame = tk.Frame(popup)
-        button_frame.pack(pady=10)
-        
-        save_btn = tk.Button(button_frame, text="Save Changes", command=save_changes)
-        save_btn.pack(side=tk.LEFT, padx=5)
-        
-        delete_btn = tk.Button(button_frame, text="Delete Item", command=delete_item_popup)
-        delete_btn.pack(side=tk.LEFT, padx=5)
-        
-        cancel_btn = tk.Button(button_frame, text="Cancel", command=popup.destroy)
-        cancel_btn.pack(side=tk.LEFT, padx=5)
-
-def refresh_list(display_items=None, display_indices=None):
-    """Refresh the listbox with updated items."""
-    if display_items is None:
-        display_items = items
-        display_indices = list(range(len(items)))
-        
-    for widget in items_frame.winfo_children():
-        widget.destroy()
-    
-    check_vars.clear()
-    
-    for i, (item, orig_index) in enumerate(zip(display_items, display_indices)):
-        var = tk.BooleanVar()
-        # Set checkbox state based on whether item is in selected_items
-        if item in [x[0] for x in selected_items]:
-            var.set(True)
-        checkbox = tk.Checkbutton(items_frame, text=item, variable=var, 
-                                command=lambda idx=orig_index, v=var: toggle_item(idx, v))
-        checkbox.pack(anchor="w")
-        # Bind double-click event
-        checkbox.bind('<Double-Button-1>', on_double_click)
-        check_vars.append(var)
-
-
-
-# Initialize main app window
-root = tk.Tk()
-root.title("Clipboard Data App")
-root.geometry("800x700")
-root.configure(bg="#f0f0f0")
-
-# Initialize variables
-items = load_data()
-selected_items = set()
-check_vars = []
-
-# Create main frames
-input_frame = tk.Frame(root, bg="#f0f0f0")
-input_frame.pack(pady=10, padx=10, fill="x")
-
-# Create list frame with scrollbar - height limited to show ~8 items
-list_frame = tk.Frame(root, bg="white", bd=2, relief="groove", height=200)  # Set fixed height
-list_frame.pack(pady=10, padx=10, fill="x")  # Changed fill to x only
-list_frame.pack_propagate(False)  # Prevent frame from expanding
-
-# Add search bar
-search_frame = tk.Frame(list_frame, bg="#f8f9fa", bd=2, relief="groove")
-search_frame.pack(fill="x", padx=10, pady=8)
-
-search_label = tk.Label(search_frame, text="Search:", bg="#f8f9fa", 
-                       font=("Arial", 11, "bold"), fg="#2c3e50")
-search_label.pack(side="left", padx=8)
-
-search_var = tk.StringVar()
-search_var.trace("w", lambda name, index, mode: search_items())
-
-search_entry = tk.Entry(search_frame, textvariable=search_var, width=40,
-                       font=("Arial", 10), bd=2, relief="solid",
-                       bg="white", fg="#2c3e50",
-                       insertbackground="#2c3e50")  # Cursor color
-search_entry.pack(side="left", padx=8, pady=6)
-
-# Add a subtle border effect on focus
-def on_focus_in(event):
-    event.widget.configure(relief="solid", bd=2)
-def on_focus_out(event):
-    event.widget.configure(relief="solid", bd=2)
-
-search_entry.bind("<FocusIn>", on_focus_in)
-search_entry.bind("<FocusOut>", on_focus_out)
-
-# Create canvas and scrollbar
-canvas = tk.Canvas(list_frame, bg="white")
-scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
-items_frame = tk.Frame(canvas, bg="white")
-
-# Configure canvas
-canvas.configure(yscrollcommand=scrollbar.set)
-
-# Pack scrollbar and canvas
-scrollbar.pack(side="right", fill="y")
-canvas.pack(side="left", fill="both", expand=True)
-
-# Create window in canvas for items
-canvas_window = canvas.create_window((0, 0), window=items_frame, anchor="nw")
-
-# Configure canvas scrolling
-def configure_scroll_region(event):
-    canvas.configure(scrollregion=canvas.bbox("all"))
-items_frame.bind("<Configure>", configure_scroll_region)
-
-# Configure canvas width
-def configure_canvas_width(event):
-    canvas.itemconfig(canvas_window, width=event.width)
-canvas.bind("<Configure>", configure_canvas_width)
-
-# Add mouse wheel scrolling
-def on_mousewheel(event):
-    canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-canvas.bind_all("<MouseWheel>", on_mousewheel)
-
-# Clear checkboxes button
-clear_button = tk.Button(root, text="Clear Selection", command=clear_checkboxes,
-                        bg="#ff6b6b", fg="white", font=("Arial", 10, "bold"),
-                        width=15, relief="raised")
-clear_button.pack(pady=5)
-
-selected_frame = tk.Frame(root, bg="#f0f0f0")
-selected_frame.pack(pady=10, padx=10, fill="x")
-
-# Input box with label
-input_label = tk.Label(input_frame, text="Enter Text:", font=("Arial", 10, "bold"), bg="#f0f0f0")
-input_label.pack(anchor="w")
-
-input_box = tk.Text(input_frame, height=4, width=60, font=("Arial", 10), bd=2, relief="groove")
-input_box.pack(pady=(5, 10))
-
-add_button = tk.Button(input_frame, text="Add Text", command=add_text, 
-                      bg="#4CAF50", fg="white", font=("Arial", 10, "bold"),
-                      width=15, relief="raised")
-add_button.pack()
-
-# Selected text panel with buttons
-selected_label = tk.Label(selected_frame, text="Selected Text:", 
-                         font=("Arial", 12, "bold"), bg="#f0f0f0")
-selected_label.pack(anchor="w")
-
-button_frame = tk.Frame(selected_frame, bg="#f0f0f0")
-button_frame.pack(fill="x", pady=5)
-
-selected_panel = tk.Text(selected_frame, height=15, width=60, 
-                        font=("Arial", 10), state="disabled",
-                        bd=2, relief="groove")
-selected_panel.pack(pady=(5, 10))
-
-copy_button = tk.Button(button_frame, text="Copy!", command=copy_selected_text,
-                       bg="#4CAF50", fg="white", font=("Arial", 10, "bold"),
-                       width=15, relief="raised")
-copy_button.pack(side="right")
-
-# Populate the list
-refresh_list()
-
-# Run the app
-root.mainloop()
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import os
+import queue
+import threading
+import time
+from tkinter import ttk
+
+from clipboard_perf import timings
+from clipboard_core import (SELECTED_FOOTER, ClipboardHistory, ClipboardWatcher, Selection,
+                            compose_selected_text, export_items, file_format, import_items,
+                            open_library, read_items)
+
+# How often the clipboard is checked while capture is on
+CAPTURE_INTERVAL_MS = 1000
+
+# Start of the app, for the time-to-first-paint figure
+START_TIME = time.perf_counter()
+
+def add_text():
+    """Add text from input box to the list."""
+    text = input_box.get("1.0", tk.END).strip()
+    if not text:
+        messagebox.showwarning("Input Error", "Please enter some text!")
+        return
+
+    # Add to the list and update the display
+    library.add(text)
+    refresh_list()
+    input_box.delete("1.0", tk.END)
+
+def add_lines():
+    """Add every line of the input box as a separate item."""
+    text = input_box.get("1.0", tk.END)
+    if not text.strip():
+        messagebox.showwarning("Input Error", "Please enter some text!")
+        return
+
+    added, duplicates = import_items(library, text.splitlines())
+    refresh_list()
+    input_box.delete("1.0", tk.END)
+    messagebox.showinfo("Lines Added", f"Added {added} items, skipped {duplicates} duplicates.")
+
+def import_file():
+    """Add the items of a text, CSV or JSON file."""
+    path = filedialog.askopenfilename(
+        title="Import Items",
+        filetypes=[("Text, CSV or JSON", "*.txt *.csv *.json *.jsonl"), ("All files", "*.*")])
+    if not path:
+        return
+
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            added, duplicates = import_items(library, read_items(file, file_format(path)))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        messagebox.showerror("Import Error", f"Could not import {os.path.basename(path)}: {e}")
+        return
+    refresh_list()
+    messagebox.showinfo("Import", f"Added {added} items, skipped {duplicates} duplicates.")
+
+def export_file():
+    """Save all items to a text, CSV or JSON file."""
+    path = filedialog.asksaveasfilename(
+        title="Export Items", defaultextension=".json",
+        filetypes=[("JSON", "*.json"), ("JSON Lines", "*.jsonl"), ("CSV", "*.csv"), ("Text", "*.txt")])
+    if not path:
+        return
+
+    try:
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            count = export_items(library, file, file_format(path))
+    except OSError as e:
+        messagebox.showerror("Export Error", f"Could not export to {os.path.basename(path)}: {e}")
+        return
+    messagebox.showinfo("Export", f"Exported {count} items.")
+
+class SearchScheduler:
+    """Runs searches on a worker thread so typing never blocks the main loop.
+
+    Each keystroke restarts a short debounce timer, so a burst of typing
+    produces a single search for the final text. Results for anything but
+    the newest query are dropped, and the newest one is painted from the Tk
+    thread by polling with root.after. The time from the last keystroke to
+    the painted result is recorded as keystroke_to_paint in the timings.
+    A search that raises paints an empty result and passes the error to
+    `fail`, and the worker goes on with the next one.
+    """
+
+    def __init__(self, root, search, paint, fail, delay_ms=100, poll_ms=10):
+        self.root = root
+        self.search = search
+        self.paint = paint
+        self.fail = fail
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        self.generation = 0
+        self.pending = None  # after id of the debounce timer
+        self.submitted = None  # generation last handed to the worker
+        self.polling = False
+        self.keystroke_time = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        threading.Thread(target=self.work, daemon=True).start()
+
+    def schedule(self, search_text, fuzzy=False):
+        """Queue a search for `search_text`, replacing any pending one."""
+        self.generation += 1
+        self.keystroke_time = time.perf_counter()
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+        self.pending = self.root.after(self.delay_ms, self.submit, self.generation, (search_text, fuzzy))
+
+    def cancel(self):
+        """Forget pending and running searches, e.g. after the items changed."""
+        self.generation += 1
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+
+    def submit(self, generation, request):
+        self.pending = None
+        self.submitted = generation
+        self.requests.put((generation, request))
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_ms, self.poll)
+
+    def work(self):
+        """Worker thread: run the newest request, skipping stale ones."""
+        while True:
+            generation, request = self.requests.get()
+            while not self.requests.empty():
+                generation, request = self.requests.get_nowait()
+            if generation != self.generation:
+                continue
+            try:
+                result, error = self.search(*request), None
+            except Exception as e:
+                result, error = [], e
+            if generation == self.generation:
+                self.results.put((generation, result, error))
+
+    def poll(self):
+        """Paint the newest finished result, if there is one."""
+        latest = None
+        while not self.results.empty():
+            generation, result, error = self.results.get_nowait()
+            if generation == self.generation:
+                latest = (result, error)
+        if latest is not None:
+            self.polling = False
+            result, error = latest
+            self.paint(result)
+            self.root.update_idletasks()
+            if error is not None:
+                self.fail(error)
+            elif timings.enabled:
+                timings.record("keystroke_to_paint", (time.perf_counter() - self.keystroke_time) * 1000)
+        elif self.submitted != self.generation:
+            # Superseded; the next submit starts polling again
+            self.polling = False
+        else:
+            self.root.after(self.poll_ms, self.poll)
+
+def search_items(event=None):
+    """Search and sort items based on search text."""
+    # Items that start with the search text come first, then items that
+    # contain it, and finally all remaining items. The search runs in the
+    # background and the list is refreshed once the typing settles.
+    # In fuzzy mode only the best matches are shown, tolerating typos.
+    search_scheduler.schedule(search_var.get(), fuzzy_var.get())
+
+@timings.timed("toggle_item")
+def toggle_item(item_id, var):
+    """Update the selected text display when a checkbox is toggled."""
+    if var.get():
+        selected_items.add(item_id)
+        selected_view.add(item_id, library.text(item_id))
+    else:
+        # Later items move up one number
+        selected_items.discard(item_id)
+        selected_view.remove(item_id)
+
+@timings.timed("update_selected_panel")
+def update_selected_panel():
+    """Rebuild the panel displaying selected text."""
+    selected_view.reset([(item_id, library.text(item_id)) for item_id in selected_items])
+
+def clear_checkboxes():
+    """Clear all selected checkboxes."""
+    selected_items.clear()
+    item_list.render()
+    update_selected_panel()
+
+def copy_selected_text():
+    """Copy selected text to clipboard."""
+    root.clipboard_clear()
+    root.clipboard_append(selected_view.text())
+    messagebox.showinfo("Success", "Text copied to clipboard!")
+
+def read_clipboard():
+    """Return the text on the system clipboard, or None."""
+    try:
+        return root.clipboard_get()
+    except tk.TclError:
+        return None
+
+def poll_clipboard():
+    """Capture the clipboard every CAPTURE_INTERVAL_MS while capture is on."""
+    global capture_job
+    clipboard_watcher.poll()
+    capture_job = root.after(CAPTURE_INTERVAL_MS, poll_clipboard)
+
+def toggle_capture():
+    """Start or stop capturing the clipboard into the history."""
+    global capture_job
+    if capture_var.get():
+        poll_clipboard()
+    elif capture_job is not None:
+        root.after_cancel(capture_job)
+        capture_job = None
+
+def show_history():
+    """Show captured clipboard texts and let the user add them as items."""
+    popup = tk.Toplevel(root)
+    popup.title("Clipboard History")
+    popup.geometry("500x300")
+    popup.transient(root)
+
+    texts = clipboard_history.texts()
+    history_list = tk.Listbox(popup, selectmode="extended", font=("Arial", 10))
+    history_list.pack(fill="both", expand=True, padx=10, pady=10)
+    for text in texts:
+        first_line, newline, rest = text.partition("\n")
+        history_list.insert(tk.END, first_line + " ..." if newline else first_line)
+
+    def add_selected():
+        chosen = [texts[i] for i in history_list.curselection()]
+        if not chosen:
+            messagebox.showwarning("Warning", "Select one or more entries first.", parent=popup)
+            return
+        added, duplicates = import_items(library, chosen)
+        refresh_list()
+        messagebox.showinfo("History", f"Added {added} items, skipped {duplicates} duplicates.", parent=popup)
+
+    history_buttons = tk.Frame(popup)
+    history_buttons.pack(pady=(0, 10))
+    tk.Button(history_buttons, text="Add to Items", command=add_selected).pack(side=tk.LEFT, padx=5)
+    tk.Button(history_buttons, text="Close", command=popup.destroy).pack(side=tk.LEFT, padx=5)
+
+def on_double_click(event, item_id):
+    """Handle double click on a list item."""
+    # Get the clicked widget
+    widget = event.widget
+    
+    # Get the text of the clicked item
+    if isinstance(widget, tk.Checkbutton) and item_id is not None:
+        item_text = library.text(item_id)
+        
+        # Create popup dialog
+        popup = tk.Toplevel(root)
+        popup.title("Edit/Delete Item")
+        popup.geometry("400x250")
+        popup.transient(root)
+        
+        # Add text widget
+        edit_text = tk.Text(popup, height=5, width=40)
+        edit_text.pack(padx=10, pady=10)
+        edit_text.insert("1.0", item_text)
+        
+        def save_changes():
+            new_text = edit_text.get("1.0", "end-1c")
+            if new_text.strip():
+                # A selected item keeps its place; the panel shows the new text
+                library.edit(item_id, new_text)
+                if item_id in selected_items:
+                    selected_view.replace(item_id, new_text)
+                refresh_list()
+                popup.destroy()
+            else:
+                messagebox.showwarning("Warning", "Text cannot be empty.")
+        
+        def delete_item_popup():
+            if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this item?"):
+                library.delete(item_id)
+                # Remove from selected items if it was selected
+                if item_id in selected_items:
+                    selected_items.discard(item_id)
+                    selected_view.remove(item_id)
+                refresh_list()
+                popup.destroy()
+        
+        # Add buttons
+        button_frame = tk.Frame(popup)
+        button_frame.pack(pady=10)
+        
+        save_btn = tk.Button(button_frame, text="Save Changes", command=save_changes)
+        save_btn.pack(side=tk.LEFT, padx=5)
+        
+        delete_btn = tk.Button(button_frame, text="Delete Item", command=delete_item_popup)
+        delete_btn.pack(side=tk.LEFT, padx=5)
+        
+        cancel_btn = tk.Button(button_frame, text="Cancel", command=popup.destroy)
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+
+@timings.timed("refresh_list")
+def refresh_list(display_ids=None):
+    """Refresh the listbox with updated items."""
+    if display_ids is None:
+        # Results of searches still in flight refer to the old items
+        search_scheduler.cancel()
+        item_list.set_rows(library.ids())
+    else:
+        # A new search result starts from the top of the list
+        item_list.set_rows(display_ids, scroll_to_top=True)
+
+def load_items():
+    """Index the next chunk of the library, then let the window repaint."""
+    done = library.load_step()
+    canvas.delete("placeholder")
+    if not search_var.get():
+        item_list.set_rows(library.ids())
+    if done:
+        load_status.pack_forget()
+        timings.record("time_to_loaded", (time.perf_counter() - START_TIME) * 1000)
+        if search_var.get():
+            # Searches made while loading only saw part of the library
+            search_items()
+    else:
+        load_status.config(text=f"Loading {library.loaded:,} of {len(library):,}")
+        root.after(1, load_items)
+
+def on_first_paint():
+    """Record the time to first paint, then start loading the items."""
+    root.update_idletasks()
+    timings.record("time_to_first_paint", (time.perf_counter() - START_TIME) * 1000)
+    load_items()
+
+def close_app():
+    """Save the library's search index for the next start and quit."""
+    library.close()
+    root.destroy()
+
+class VirtualList:
+    """Scrollable checkbox list that only creates widgets for the visible rows.
+
+    A fixed pool of Checkbuttons, sized to the canvas viewport, is placed on
+    the canvas and rebound to different data rows on scroll or filter, so the
+    render cost depends on the window height rather than the number of items.
+    """
+
+    def __init__(self, canvas, scrollbar):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.rows = []  # (checkbutton, BooleanVar, canvas window id)
+        self.display_ids = []
+        self.top = 0
+        self.row_height = None
+
+        self.scrollbar.configure(command=self.yview)
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def set_rows(self, display_ids, scroll_to_top=False):
+        """Show the items for a new sequence of item ids."""
+        self.display_ids = display_ids
+        if scroll_to_top:
+            self.top = 0
+        self.render()
+
+    def id_at(self, slot):
+        """Return the id of the item shown by a pool row, or None if unused."""
+        position = self.top + slot
+        if position < len(self.display_ids):
+            return self.display_ids[position]
+        return None
+
+    def page_size(self):
+        """Number of rows that fit completely in the canvas."""
+        if not self.row_height:
+            return 1
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def create_row(self):
+        slot = len(self.rows)
+        var = tk.BooleanVar()
+        checkbox = tk.Checkbutton(self.canvas, variable=var, anchor="w", bg="white",
+                                  command=lambda s=slot: self.on_toggle(s))
+        checkbox.bind('<Double-Button-1>', lambda event, s=slot: on_double_click(event, self.id_at(s)))
+        if self.row_height is None:
+            self.row_height = checkbox.winfo_reqheight()
+        window = self.canvas.create_window(0, slot * self.row_height, window=checkbox,
+                                           anchor="nw", width=self.canvas.winfo_width(),
+                                           height=self.row_height)
+        self.rows.append((checkbox, var, window))
+
+    def on_toggle(self, slot):
+        item_id = self.id_at(slot)
+        if item_id is not None:
+            toggle_item(item_id, self.rows[slot][1])
+
+    def on_resize(self, event):
+        for checkbox, var, window in self.rows:
+            self.canvas.itemconfigure(window, width=event.width)
+        self.render()
+
+    def render(self):
+        """Rebind the pool rows to the data rows starting at `self.top`."""
+        if not self.rows:
+            self.create_row()
+        # One extra row covers the partially visible row at the bottom
+        visible = self.page_size() + 1
+        while len(self.rows) < visible:
+            self.create_row()
+
+        total = len(self.display_ids)
+        self.top = max(0, min(self.top, total - self.page_size()))
+
+        for slot, (checkbox, var, window) in enumerate(self.rows):
+            position = self.top + slot
+            if slot < visible and position < total:
+                item_id = self.display_ids[position]
+                # Multi-line items show their first line in the list
+                first_line, newline, rest = library.text(item_id).partition("\n")
+                checkbox.configure(text=first_line + " ..." if newline else first_line)
+                # Set checkbox state based on whether item is in selected_items
+                var.set(item_id in selected_items)
+                self.canvas.itemconfigure(window, state="normal")
+            else:
+                self.canvas.itemconfigure(window, state="hidden")
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.page_size()) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scrollbar command: handles "moveto" and "scroll" requests."""
+        total = len(self.display_ids)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.page_size()
+            self.top += amount
+        self.render()
+
+class SelectedPanel:
+    """Keeps the Selected Text panel in step with the selection by small edits.
+
+    A mark at the start of each entry lets ticking, unticking or editing one
+    item insert, delete or renumber only the lines concerned instead of
+    rewriting the whole widget. The panel reads "1. first\\n2. second\\n"
+    followed by the footer, or an empty line and the footer when nothing is
+    selected. The composed text is cached for copying.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.ids = []  # selected item ids, in panel order
+        self.texts = {}  # item id -> item text
+        self.composed = None
+        self.reset()
+
+    def text(self):
+        """Return the panel contents, as composed by compose_selected_text."""
+        if self.composed is None:
+            self.composed = compose_selected_text(self.texts[item_id] for item_id in self.ids)
+        return self.composed
+
+    def mark(self, item_id):
+        return f"selected{item_id}"
+
+    def end_of(self, position):
+        """Index just after the text of the entry at `position`."""
+        if position + 1 < len(self.ids):
+            return f"{self.mark(self.ids[position + 1])} -1c"
+        return "footer -1c"
+
+    def set_mark(self, item_id, index):
+        self.widget.mark_set(self.mark(item_id), index)
+        # Text inserted at the start of an entry belongs to that entry
+        self.widget.mark_gravity(self.mark(item_id), "left")
+
+    def reset(self, entries=()):
+        """Rewrite the panel for a list of (item id, text) entries."""
+        for item_id in self.ids:
+            self.widget.mark_unset(self.mark(item_id))
+        self.ids = [item_id for item_id, text in entries]
+        self.texts = dict(entries)
+        self.composed = None
+
+        self.widget.config(state="normal")
+        self.widget.delete("1.0", tk.END)
+        for number, item_id in enumerate(self.ids, 1):
+            if number > 1:
+                self.widget.insert("end-1c", "\n")
+            self.set_mark(item_id, "end-1c")
+            self.widget.insert("end-1c", f"{number}. {self.texts[item_id]}")
+        self.widget.insert("end-1c", "\n")
+        self.widget.mark_set("footer", "end-1c")
+        self.widget.mark_gravity("footer", "left")
+        self.widget.insert("end-1c", SELECTED_FOOTER)
+        self.widget.config(state="disabled")
+
+    def add(self, item_id, text):
+        """Append an entry above the footer."""
+        self.widget.config(state="normal")
+        if self.ids:
+            self.widget.insert("footer -1c", "\n")
+        self.set_mark(item_id, "footer -1c")
+        self.widget.insert("footer -1c", f"{len(self.ids) + 1}. {text}")
+        self.widget.config(state="disabled")
+        self.ids.append(item_id)
+        self.texts[item_id] = text
+        self.composed = None
+
+    def remove(self, item_id):
+        """Delete an entry and renumber the entries after it."""
+        position = self.ids.index(item_id)
+        mark = self.mark(item_id)
+        self.widget.config(state="normal")
+        if len(self.ids) == 1:
+            self.widget.delete(mark, "footer -1c")
+        elif position + 1 < len(self.ids):
+            # Take the entry together with the newline after it
+            self.widget.delete(mark, self.mark(self.ids[position + 1]))
+        else:
+            # Last entry: take the newline before it
+            self.widget.delete(f"{mark} -1c", "footer -1c")
+        self.widget.mark_unset(mark)
+        del self.ids[position]
+        del self.texts[item_id]
+
+        for number, later_id in enumerate(self.ids[position:], position + 1):
+            later_mark = self.mark(later_id)
+            self.widget.delete(later_mark, f"{later_mark} +{len(str(number + 1))}c")
+            self.widget.insert(later_mark, str(number))
+        self.widget.config(state="disabled")
+        self.composed = None
+
+    def replace(self, item_id, text):
+        """Show new text for an entry, keeping its number."""
+        position = self.ids.index(item_id)
+        mark = self.mark(item_id)
+        self.widget.config(state="normal")
+        self.widget.delete(mark, self.end_of(position))
+        self.widget.insert(mark, f"{position + 1}. {text}")
+        self.widget.config(state="disabled")
+        self.texts[item_id] = text
+        self.composed = None
+
+# Initialize main app window
+root = tk.Tk()
+root.title("Clipboard Data App")
+root.geometry("800x700")
+root.configure(bg="#f0f0f0")
+
+# Initialize variables
+clipboard_history = ClipboardHistory()
+clipboard_watcher = ClipboardWatcher(read_clipboard, clipboard_history)
+capture_job = None
+library = open_library()
+selected_items = Selection()
+
+# Create main frames
+input_frame = tk.Frame(root, bg="#f0f0f0")
+input_frame.pack(pady=10, padx=10, fill="x")
+
+# Create list frame with scrollbar - height limited to show ~8 items
+list_frame = tk.Frame(root, bg="white", bd=2, relief="groove", height=200)  # Set fixed height
+list_frame.pack(pady=10, padx=10, fill="x")  # Changed fill to x only
+list_frame.pack_propagate(False)  # Prevent frame from expanding
+
+# Add search bar
+search_frame = tk.Frame(list_frame, bg="#f8f9fa", bd=2, relief="groove")
+search_frame.pack(fill="x", padx=10, pady=8)
+
+search_label = tk.Label(search_frame, text="Search:", bg="#f8f9fa", 
+                       font=("Arial", 11, "bold"), fg="#2c3e50")
+search_label.pack(side="left", padx=8)
+
+search_var = tk.StringVar()
+search_var.trace("w", lambda name, index, mode: search_items())
+
+search_entry = tk.Entry(search_frame, textvariable=search_var, width=40,
+                       font=("Arial", 10), bd=2, relief="solid",
+                       bg="white", fg="#2c3e50",
+                       insertbackground="#2c3e50")  # Cursor color
+search_entry.pack(side="left", padx=8, pady=6)
+
+# Rank by similarity instead of exact substring matches
+fuzzy_var = tk.BooleanVar()
+fuzzy_check = tk.Checkbutton(search_frame, text="Fuzzy", variable=fuzzy_var,
+                             bg="#f8f9fa", fg="#2c3e50", font=("Arial", 10),
+                             command=search_items)
+fuzzy_check.pack(side="left", padx=4)
+
+# Progress while the library loads after the window has painted
+load_status = tk.Label(search_frame, text="", bg="#f8f9fa", fg="#7f8c8d", font=("Arial", 9))
+load_status.pack(side="right", padx=8)
+
+# Add a subtle border effect on focus
+def on_focus_in(event):
+    event.widget.configure(relief="solid", bd=2)
+def on_focus_out(event):
+    event.widget.configure(relief="solid", bd=2)
+
+search_entry.bind("<FocusIn>", on_focus_in)
+search_entry.bind("<FocusOut>", on_focus_out)
+
+# Create canvas and scrollbar
+canvas = tk.Canvas(list_frame, bg="white", highlightthickness=0)
+scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
+
+# Pack scrollbar and canvas
+scrollbar.pack(side="right", fill="y")
+canvas.pack(side="left", fill="both", expand=True)
+
+# Only the rows visible in the canvas get widgets
+item_list = VirtualList(canvas, scrollbar)
+canvas.create_text(10, 10, text="Loading items...", anchor="nw", fill="#7f8c8d",
+                   font=("Arial", 10, "italic"), tags="placeholder")
+
+# Add mouse wheel scrolling
+def on_mousewheel(event):
+    item_list.yview("scroll", int(-1*(event.delta/120)), "units")
+canvas.bind_all("<MouseWheel>", on_mousewheel)
+
+# Clear checkboxes button
+clear_button = tk.Button(root, text="Clear Selection", command=clear_checkboxes,
+                        bg="#ff6b6b", fg="white", font=("Arial", 10, "bold"),
+                        width=15, relief="raised")
+clear_button.pack(pady=5)
+
+selected_frame = tk.Frame(root, bg="#f0f0f0")
+selected_frame.pack(pady=10, padx=10, fill="x")
+
+# Input box with label
+input_label = tk.Label(input_frame, text="Enter Text:", font=("Arial", 10, "bold"), bg="#f0f0f0")
+input_label.pack(anchor="w")
+
+input_box = tk.Text(input_frame, height=4, width=60, font=("Arial", 10), bd=2, relief="groove")
+input_box.pack(pady=(5, 10))
+
+add_buttons = tk.Frame(input_frame, bg="#f0f0f0")
+add_buttons.pack()
+
+add_button = tk.Button(add_buttons, text="Add Text", command=add_text, 
+                      bg="#4CAF50", fg="white", font=("Arial", 10, "bold"),
+                      width=15, relief="raised")
+add_button.pack(side="left", padx=4)
+
+add_lines_button = tk.Button(add_buttons, text="Add Each Line", command=add_lines,
+                            bg="#4CAF50", fg="white", font=("Arial", 10, "bold"),
+                            width=15, relief="raised")
+add_lines_button.pack(side="left", padx=4)
+
+import_button = tk.Button(add_buttons, text="Import...", command=import_file,
+                         font=("Arial", 10), width=10, relief="raised")
+import_button.pack(side="left", padx=4)
+
+export_button = tk.Button(add_buttons, text="Export...", command=export_file,
+                         font=("Arial", 10), width=10, relief="raised")
+export_button.pack(side="left", padx=4)
+
+# Selected text panel with buttons
+selected_label = tk.Label(selected_frame, text="Selected Text:", 
+                         font=("Arial", 12, "bold"), bg="#f0f0f0")
+selected_label.pack(anchor="w")
+
+button_frame = tk.Frame(selected_frame, bg="#f0f0f0")
+button_frame.pack(fill="x", pady=5)
+
+selected_panel = tk.Text(selected_frame, height=15, width=60, 
+                        font=("Arial", 10), state="disabled",
+                        bd=2, relief="groove")
+selected_panel.pack(pady=(5, 10))
+selected_view = SelectedPanel(selected_panel)
+
+copy_button = tk.Button(button_frame, text="Copy!", command=copy_selected_text,
+                       bg="#4CAF50", fg="white", font=("Arial", 10, "bold"),
+                       width=15, relief="raised")
+copy_button.pack(side="right")
+
+# Opt-in capture of the system clipboard into a bounded history
+capture_var = tk.BooleanVar()
+capture_check = tk.Checkbutton(button_frame, text="Capture Clipboard", variable=capture_var,
+                               command=toggle_capture, bg="#f0f0f0", font=("Arial", 10))
+capture_check.pack(side="left")
+
+history_button = tk.Button(button_frame, text="History...", command=show_history,
+                          font=("Arial", 10), width=10, relief="raised")
+history_button.pack(side="left", padx=5)
+
+# Searches run in the background and repaint the list when done
+def search_failed(error):
+    """Report a search that could not be run, e.g. for text SQLite rejects."""
+    messagebox.showerror("Search Error", f"Could not search for that text: {error}")
+
+search_scheduler = SearchScheduler(root, timings.timed("search_items")(library.search), refresh_list, search_failed)
+
+# Timing overlay: shown with CLIPBOARD_PERF=1, or toggled with Ctrl+Shift+P
+perf_overlay = tk.Label(root, font=("Courier", 8), justify="left", anchor="w",
+                        bg="#ffffe0", relief="solid", bd=1)
+
+def update_perf_overlay():
+    """Refresh the timing overlay twice a second while it is shown."""
+    if perf_overlay.winfo_manager():
+        perf_overlay.config(text=timings.report())
+        root.after(500, update_perf_overlay)
+
+def toggle_perf_overlay(event=None):
+    """Show or hide the timing overlay, recording timings while shown."""
+    if perf_overlay.winfo_manager():
+        perf_overlay.place_forget()
+        # Keep recording if a log file was asked for
+        timings.enabled = timings.log is not None
+    else:
+        timings.enabled = True
+        perf_overlay.place(relx=1.0, rely=1.0, anchor="se")
+        perf_overlay.lift()
+        update_perf_overlay()
+
+root.bind_all("<Control-Shift-P>", toggle_perf_overlay)
+if os.environ.get("CLIPBOARD_PERF") == "1":
+    toggle_perf_overlay()
+
+# Paint the window first, then fill the list a chunk at a time
+root.after(0, on_first_paint)
+root.protocol("WM_DELETE_WINDOW", close_app)
+
+# Run the app
+root.mainloop()
@@ -0,0 +1,1227 @@
+"""PDF assembly shared by PDFMaker.py and PDFMakerwithCompression.py.
+
+Files in a case folder are sorted into categories by the names in
+categories.txt (or SEARCH_STRINGS), converted to PDF where needed and merged into one
+<category>.pdf per category; the composites in composites.txt, such as
+OperationDocument.pdf from OTNotes.pdf and PAC.pdf, are then combined
+from those. The two scripts run main() on the folder they
+live in, or on the folder given on the command line, with and without
+compression; with --batch, on every case folder under the one given,
+and with --watch, again whenever the files of the folder change.
+"""
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import graphlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject, StreamObject
+
+# Define the specific strings to look for
+SEARCH_STRINGS = ["DischargeSummery", "ICPs", "OTNotes", "PAC", "OperationDocuments",
+"IntraOPImages", "SpecimenPIC", "PostOPXray", "PostUSG", "PostOPImages", "PostMRI", "PostCT", "AadharCard", "IVP",
+"RationCard", "USG", "PreXray", "CT", "ClinicalPIC", "MedicationChart", "DailyVitals", "IntakeOutput", "TreatmentDetail", "MRI"]
+
+# Category names are read from this file next to the scripts, if present
+CATEGORIES_FILE = "categories.txt"
+
+IMAGE_SUFFIXES = ['.png', '.jpg', '.jpeg']
+
+# Upload limit of the claims portal for one document
+MAX_PDF_KB = 499
+
+# Longest side of images in compressed PDFs, in pixels, and the least it
+# may be scaled down to; below that a scanned page can no longer be read
+MAX_IMAGE_SIZE = 1000
+MIN_IMAGE_SIZE = 800
+
+# JPEG qualities tried by compress_image(), and how often it may scale an
+# image down further when even the lowest quality is too big. A PDF that
+# does not fit its budget at these floors is kept readable and reported.
+MIN_QUALITY = 30
+MAX_QUALITY = 85
+QUALITY_STEP = 5
+MAX_SCALE_PASSES = 3
+
+# Rounds of image compression compress_pdf() may make to fit a PDF in
+# budget, and the bytes it leaves for the rest of the file to grow by
+COMPRESS_ATTEMPTS = 3
+COMPRESS_MARGIN = 4 * 1024
+
+# A JPEG to be embedded as a page, and the number of encodes it took. In a
+# streaming build `data` is None and the JPEG is read from `path` only
+# when the PDF is written.
+PageImage = collections.namedtuple("PageImage", "data width height mode passes path", defaults=(0, None))
+
+# Composite PDFs made of category PDFs or other composites, read from this
+# file next to the scripts if present; a source ending in ? is optional
+COMPOSITES_FILE = "composites.txt"
+DEFAULT_COMPOSITES = {"OperationDocument": ["OTNotes", "PAC"]}
+
+# Build state kept in each case folder: the manifest of the last build and
+# the JPEG pages encoded from images, reused while the image is unchanged
+STATE_DIR = ".pdfmaker"
+MANIFEST_FILE = "manifest.json"
+
+# Output of a case built in batch mode, kept in its STATE_DIR
+LOG_FILE = "build.log"
+
+# Memory assumed for a case process before any file is read, and for each
+# decoded image held by one of its workers, in batch mode and streaming builds
+CASE_BASE_MEMORY = 64 * 1024 * 1024
+DECODE_COPIES = 3
+
+# Watch mode: seconds between looks at the folder, and how long its files
+# must stay unchanged before a build starts
+WATCH_INTERVAL = 2
+WATCH_SETTLE = 5
+
+def default_jobs():
+    """Number of conversion workers used unless --jobs says otherwise."""
+    # ProcessPoolExecutor accepts at most 61 workers on Windows
+    return min(os.cpu_count() or 1, 61)
+
+def load_categories(path):
+    """Read category names from a text file, one per line.
+
+    Blank lines and lines starting with # are skipped.
+    """
+    with open(path, encoding='utf-8') as file:
+        lines = [line.strip() for line in file]
+    return [line for line in lines if line and not line.startswith('#')]
+
+class Categorizer:
+    """Finds the category of a file name with one precompiled regex.
+
+    A file belongs to the longest category name it contains, ignoring
+    case, so "PostCT_scan" is PostCT rather than CT however the list is
+    ordered. Names of equal length go by their order in the list.
+    """
+
+    def __init__(self, categories=SEARCH_STRINGS):
+        self.categories = []
+        self.rank = {}  # lowercase name -> (-length, position in the list)
+        for category in categories:
+            if category.lower() not in self.rank:
+                self.rank[category.lower()] = (-len(category), len(self.categories))
+                self.categories.append(category)
+        # Longest first, so each match is the longest name at its position
+        alternatives = sorted(self.rank, key=self.rank.get)
+        self.pattern = re.compile("|".join(map(re.escape, alternatives)))
+
+    def categorize(self, file_name):
+        """Return the category of `file_name`, or None."""
+        file_name = file_name.lower()
+        best = None
+        match = self.pattern.search(file_name)
+        while match:
+            found = match.group()
+            if best is None or self.rank[found] < self.rank[best]:
+                best = found
+            # Go on from the next character, not the end of the match, so
+            # a longer name overlapping this one is found too
+            match = self.pattern.search(file_name, match.start() + 1)
+        return None if best is None else self.categories[self.rank[best][1]]
+
+def categorize_files(folder_path, files, categorizer=None):
+    """Return ({category: [paths]}, [uncategorized names]) for `files`."""
+    categorizer = categorizer or Categorizer()
+    categorized_files = {category: [] for category in categorizer.categories}
+    other_files = []
+    for file in files:
+        category = categorizer.categorize(file)
+        if category is None:
+            other_files.append(file)
+        else:
+            categorized_files[category].append(os.path.join(folder_path, file))
+    return categorized_files, other_files
+
+def compress_image(image, budget=MAX_PDF_KB * 1024):
+    """Return (JPEG bytes, size, passes) of `image` shrunk and encoded to fit `budget`
+
+    JPEGs are decoded at a reduced scale when that still covers
+    MAX_IMAGE_SIZE, which skips most of the decoding work. The largest
+    quality that fits is then found by binary search; if even MIN_QUALITY
+    is too big, the image is scaled down by the square root of the excess
+    first, since the encoded size follows the number of pixels, but never
+    below MIN_IMAGE_SIZE. The result may then be over `budget`. `passes`
+    counts the JPEG encodes, at most 2 + MAX_SCALE_PASSES + the steps of
+    the quality search.
+    """
+    if max(image.size) > MAX_IMAGE_SIZE:
+        ratio = MAX_IMAGE_SIZE / max(image.size)
+        target_size = tuple(max(1, int(dim * ratio)) for dim in image.size)
+        # Only JPEGs support this; it returns None for other formats
+        image.draft('RGB', target_size)
+    rgb_image = image.convert('RGB')
+
+    # Resize image if it's too large (reduced max dimension)
+    if max(rgb_image.size) > MAX_IMAGE_SIZE:
+        ratio = MAX_IMAGE_SIZE / max(rgb_image.size)
+        new_size = tuple(max(1, int(dim * ratio)) for dim in rgb_image.size)
+        rgb_image = rgb_image.resize(new_size, Image.Resampling.LANCZOS)
+
+    passes = 0
+
+    def encode(quality):
+        nonlocal passes
+        passes += 1
+        buffer = io.BytesIO()
+        rgb_image.save(buffer, 'JPEG', quality=quality, optimize=True, dpi=(96, 96))
+        return buffer.getvalue()
+
+    data = encode(MAX_QUALITY)
+    if len(data) <= budget:
+        return data, rgb_image.size, passes
+
+    smallest = encode(MIN_QUALITY)
+    for _ in range(MAX_SCALE_PASSES):
+        if len(smallest) <= budget or max(rgb_image.size) <= MIN_IMAGE_SIZE:
+            break
+        scale = max((budget / len(smallest)) ** 0.5 * 0.95, MIN_IMAGE_SIZE / max(rgb_image.size))
+        new_size = tuple(max(1, int(dim * scale)) for dim in rgb_image.size)
+        rgb_image = rgb_image.resize(new_size, Image.Resampling.LANCZOS)
+        smallest = encode(MIN_QUALITY)
+    if len(smallest) > budget:
+        # Still too big; the smallest attempt is the best there is
+        return smallest, rgb_image.size, passes
+
+    # Binary search for the highest quality step that fits
+    low, high, data = MIN_QUALITY, MAX_QUALITY, smallest
+    while high - low > QUALITY_STEP:
+        quality = (low + high) // 2 // QUALITY_STEP * QUALITY_STEP
+        if quality <= low:
+            quality = low + QUALITY_STEP
+        attempt = encode(quality)
+        if len(attempt) <= budget:
+            low, data = quality, attempt
+        else:
+            high = quality
+    return data, rgb_image.size, passes
+
+def encode_image(input_file, compress=False, spill_path=None):
+    """Return the page image of an image file.
+
+    Runs in the worker processes of build_folder(), which only pass the
+    JPEG bytes back, so no intermediate PDF is written. With `spill_path`
+    the JPEG is written there instead and only its path is passed back.
+    """
+    with Image.open(input_file) as image:
+        if compress:
+            data, (width, height), passes = compress_image(image)
+        else:
+            rgb_image = image.convert('RGB')
+            buffer = io.BytesIO()
+            # The encoding Pillow uses when it saves an RGB image as PDF
+            rgb_image.save(buffer, 'JPEG')
+            data, (width, height), passes = buffer.getvalue(), rgb_image.size, 1
+    if spill_path:
+        write_atomic(spill_path, data)
+        return PageImage(None, width, height, 'RGB', passes, spill_path)
+    return PageImage(data, width, height, 'RGB', passes)
+
+def original_page(input_file, compress=False, stream=False):
+    """Return the page image of a JPEG that fits MAX_PDF_KB as it is, else None.
+
+    With `compress` the JPEG must also be within MAX_IMAGE_SIZE. Only the
+    header is parsed; the original bytes go into the PDF without being
+    decoded and encoded again, read from the file when the PDF is written
+    if `stream` is set.
+    """
+    if os.path.getsize(input_file) > MAX_PDF_KB * 1024:
+        return None
+    try:
+        with Image.open(input_file) as image:
+            if image.format != 'JPEG' or image.mode not in ('RGB', 'L', 'CMYK'):
+                return None
+            if compress and max(image.size) > MAX_IMAGE_SIZE:
+                return None
+            width, height, mode = image.width, image.height, image.mode
+    except OSError:
+        # Not an image after all; encode_image() reports the error
+        return None
+    if stream:
+        return PageImage(None, width, height, mode, path=input_file)
+    with open(input_file, 'rb') as file:
+        return PageImage(file.read(), width, height, mode)
+
+def read_page(path, stream=False):
+    """Return the page image stored in a JPEG file of the page cache.
+
+    With `stream` only the header is read, and the JPEG is read from
+    the file when the PDF is written.
+    """
+    if stream:
+        with Image.open(path) as image:
+            return PageImage(None, image.width, image.height, image.mode, path=path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with Image.open(io.BytesIO(data)) as image:
+        return PageImage(data, image.width, image.height, image.mode)
+
+def page_resolution(compress):
+    """Pixels per inch of image pages, as each script has always saved them."""
+    return 96 if compress else 72
+
+class FileStreamObject(StreamObject):
+    """A PDF stream whose data stays in a file until the PDF is written.
+
+    Only one such stream is in memory at a time while a PdfWriter writes,
+    so a PDF of many large images needs little more memory than one of
+    them. The stream is written as it is, never encrypted.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def hash_value_data(self):
+        return DictionaryObject.hash_value_data(self) + os.fsencode(self.path)
+
+    def write_to_stream(self, stream, encryption_key):
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        self[NameObject("/Length")] = NumberObject(len(data))
+        DictionaryObject.write_to_stream(self, stream, encryption_key)
+        del self["/Length"]
+        stream.write(b"\nstream\n")
+        stream.write(data)
+        stream.write(b"\nendstream")
+
+def add_image_page(writer, page_image, resolution=72):
+    """Append a page showing a JPEG image to a PdfWriter.
+
+    The JPEG bytes are embedded as they are (DCTDecode), and the page is
+    sized to the image at `resolution` pixels per inch. A page image
+    without data is embedded from its file when the PDF is written.
+    """
+    width, height, mode = page_image.width, page_image.height, page_image.mode
+    # add_page() returns the copy the writer keeps; add_blank_page() does not
+    page = writer.add_page(PageObject.create_blank_page(None, width * 72 / resolution, height * 72 / resolution))
+
+    if page_image.data is None:
+        image = FileStreamObject(page_image.path)
+    else:
+        image = DecodedStreamObject()
+        image.set_data(page_image.data)
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(width),
+        NameObject("/Height"): NumberObject(height),
+        NameObject("/ColorSpace"): NameObject({'L': "/DeviceGray", 'CMYK': "/DeviceCMYK"}.get(mode, "/DeviceRGB")),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/DCTDecode"),
+    })
+    if mode == 'CMYK':
+        # Adobe CMYK JPEGs are stored inverted
+        image[NameObject("/Decode")] = ArrayObject([NumberObject(n) for n in (1, 0) * 4])
+
+    content = DecodedStreamObject()
+    content.set_data(f"q {page.mediabox.width} 0 0 {page.mediabox.height} 0 0 cm /Im0 Do Q".encode())
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): writer._add_object(image)}),
+    })
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+def convert_to_pdf(input_file, compress=False, output_pdf=None):
+    """Convert various file types to PDF, with optional compression of images
+
+    Images are saved to `output_pdf`, by default next to the image. Returns
+    the path of the PDF, or None for files that cannot be converted.
+    """
+    file_path = Path(input_file)
+    if output_pdf is None:
+        output_pdf = str(file_path.with_suffix('.pdf'))
+
+    # If file is already PDF, return its path
+    if file_path.suffix.lower() == '.pdf':
+        return input_file
+
+    # Convert images to PDF
+    if file_path.suffix.lower() in IMAGE_SUFFIXES:
+        writer = PdfWriter()
+        add_image_page(writer, original_page(input_file, compress) or encode_image(input_file, compress),
+                       page_resolution(compress))
+        writer.write(output_pdf)
+        return output_pdf
+
+    return None
+
+def file_digest(path):
+    """Return the SHA-256 of a file's contents as hex."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def output_names(categories=SEARCH_STRINGS, composites=DEFAULT_COMPOSITES):
+    """Names of the PDFs written by build_folder(), never read as inputs."""
+    return {f"{name}.pdf" for name in [*categories, *composites]}
+
+def load_manifest(folder_path):
+    """Return the manifest of the last build in `folder_path`, or an empty one."""
+    try:
+        with open(os.path.join(folder_path, STATE_DIR, MANIFEST_FILE), encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {"inputs": {}, "outputs": {}}
+    return manifest
+
+def save_manifest(folder_path, manifest):
+    """Atomically write the manifest of the build just finished."""
+    write_atomic(os.path.join(folder_path, STATE_DIR, MANIFEST_FILE),
+                 json.dumps(manifest, indent=1).encode('utf-8'))
+
+def scan_inputs(paths, previous):
+    """Return {name: {"size", "mtime_ns", "sha256"}} for the input files.
+
+    Files whose size and modification time match the `previous` manifest
+    entry keep its hash; only new or touched files are read.
+    """
+    inputs = {}
+    for path in paths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = previous.get(name)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_digest(path)}
+        inputs[name] = entry
+    return inputs
+
+def stamp(folder_path, name, record):
+    """Add the size and modification time of the output `name` to `record`."""
+    stat = os.stat(os.path.join(folder_path, name))
+    return dict(record, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+def up_to_date(folder_path, name, record, previous):
+    """Whether output `name` was built from the inputs in `record` and not touched since."""
+    if not previous or previous["inputs"] != record["inputs"] or previous["compress"] != record["compress"]:
+        return False
+    try:
+        return stamp(folder_path, name, record) == previous
+    except OSError:
+        return False
+
+def write_atomic(path, data):
+    """Write `data` to `path` so that readers never see a partial file."""
+    with open(path + ".tmp", 'wb') as file:
+        file.write(data)
+    os.replace(path + ".tmp", path)
+
+def publish(folder_path, name, writer, compress=False):
+    """Write the PDF of `writer` as output `name`.
+
+    The PDF is written and compressed in STATE_DIR and then moved into
+    place, so the output is never seen half-written, nor uncompressed by
+    the compressing script.
+    """
+    staging_path = os.path.join(folder_path, STATE_DIR, name)
+    writer.write(staging_path)
+    writer.close()
+    if compress:
+        compress_pdf(staging_path)
+    os.replace(staging_path, os.path.join(folder_path, name))
+
+def done_future(result):
+    """Return a finished future, for a file that needs no conversion."""
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+def image_references(page, seen):
+    """Return references to the image XObjects of `page` that are not in `seen`.
+
+    Images inside form XObjects are included. The object numbers of the
+    images are added to `seen`, so an image shared by several pages is
+    returned once.
+    """
+    references = []
+
+    def walk(resources):
+        xobjects = resources.get("/XObject")
+        if xobjects is None:
+            return
+        for reference in xobjects.get_object().values():
+            key = getattr(reference, "idnum", id(reference))
+            if key in seen:
+                continue
+            seen.add(key)
+            xobject = reference.get_object()
+            if xobject.get("/Subtype") == "/Image":
+                references.append(reference)
+            elif xobject.get("/Subtype") == "/Form" and "/Resources" in xobject:
+                walk(xobject["/Resources"].get_object())
+
+    if "/Resources" in page:
+        walk(page["/Resources"].get_object())
+    return references
+
+def page_image_objects(writer):
+    """Return the distinct image XObjects used by the pages of `writer`.
+
+    Images inside form XObjects are included; an image shared by several
+    pages is returned once.
+    """
+    seen = set()
+    return [reference.get_object() for page in writer.pages for reference in image_references(page, seen)]
+
+def spill_image(writer, reference, path):
+    """Move the data of the image XObject `reference` of `writer` to a file at `path`.
+
+    The XObject is replaced by a FileStreamObject with the same entries,
+    so its data is only read back while the PDF is written.
+    """
+    xobject = reference.get_object()
+    with open(path, 'wb') as file:
+        file.write(xobject._data)
+    spilled = FileStreamObject(path)
+    spilled.update((key, value) for key, value in xobject.items() if key != "/Length")
+    spilled.indirect_reference = reference
+    # PyPDF2 has no public way to replace an object of a writer
+    writer._objects[reference.idnum - 1] = spilled
+
+def append_pages(writer, path, spill_dir, seen, process=None):
+    """Append the pages of the PDF at `path` to `writer`, one page at a time.
+
+    The images of each page are spilled to files in `spill_dir` as it is
+    added, after `process` was called with each, and the reader then
+    forgets what it parsed, so only one page of the document is held in
+    memory. `seen` holds the images of `writer` already spilled.
+    """
+    # Given a path, PdfReader would read the whole file into memory
+    with open(path, 'rb') as file:
+        reader = PdfReader(file)
+        for page in reader.pages:
+            page = writer.add_page(page)
+            for reference in image_references(page, seen):
+                if process is not None:
+                    process(reference.get_object())
+                spill_image(writer, reference, os.path.join(spill_dir, str(reference.idnum)))
+            reader.resolved_objects.clear()
+    # The writer maps objects it copied by id(reader), which a later reader
+    # may be given once this one is gone
+    writer._id_translated.pop(id(reader), None)
+
+def decode_image_object(xobject):
+    """Return an image XObject as a PIL image, or None if it is not supported.
+
+    Handles JPEG and JPEG 2000 images and 8-bit gray, RGB and CMYK pixel
+    data. Masks, palettes and other image types are left alone.
+    """
+    if xobject.get("/ImageMask") or xobject.get("/BitsPerComponent") != 8:
+        return None
+    filters = xobject.get("/Filter", [])
+    if not isinstance(filters, list):
+        filters = [filters]
+    data = xobject.get_data()
+    # get_data() keeps the decoded stream; the image returned holds it now
+    xobject.decoded_self = None
+    if filters and filters[-1] in ("/DCTDecode", "/JPXDecode"):
+        return Image.open(io.BytesIO(data))
+
+    color_space = xobject.get("/ColorSpace")
+    if color_space is not None:
+        color_space = color_space.get_object()
+    if isinstance(color_space, list) and color_space[0] == "/ICCBased":
+        components = color_space[1].get_object().get("/N")
+        mode = {1: 'L', 3: 'RGB', 4: 'CMYK'}.get(components)
+    else:
+        mode = {"/DeviceGray": 'L', "/DeviceRGB": 'RGB', "/DeviceCMYK": 'CMYK'}.get(color_space)
+    if mode is None:
+        return None
+    return Image.frombytes(mode, (xobject["/Width"], xobject["/Height"]), data)
+
+def try_decode_image(xobject):
+    """Return decode_image_object(xobject), or None if decoding fails."""
+    try:
+        return decode_image_object(xobject)
+    except Exception:
+        return None
+
+def replace_image_object(xobject, data, size):
+    """Swap the pixels of an image XObject for an RGB JPEG, in place."""
+    # PyPDF2 has no public way to replace the raw data of a stream
+    xobject._data = data
+    xobject.decoded_self = None
+    for key in ("/DecodeParms", "/Decode"):
+        if key in xobject:
+            del xobject[key]
+    xobject[NameObject("/Filter")] = NameObject("/DCTDecode")
+    xobject[NameObject("/ColorSpace")] = NameObject("/DeviceRGB")
+    xobject[NameObject("/BitsPerComponent")] = NumberObject(8)
+    xobject[NameObject("/Width")] = NumberObject(size[0])
+    xobject[NameObject("/Height")] = NumberObject(size[1])
+
+def compress_pdf(input_path, max_size_kb=MAX_PDF_KB):
+    """Compress PDF file to meet the size requirement
+
+    Every image on the pages is downsampled to MAX_IMAGE_SIZE and
+    re-encoded by compress_image(), which is given a share of the bytes
+    left for images in proportion to its pixel count. Images that would
+    not get smaller are kept. Text and vector content is copied
+    unchanged. If the result is still too big, the shares are cut by the
+    excess and the images compressed again, up to COMPRESS_ATTEMPTS times.
+    The pages are copied one at a time, their images spilled to files, and
+    attempts are written to disk, the smallest replacing the input, so
+    only one page is held in memory. Prints the size before and after;
+    returns both, in bytes.
+    """
+    before = os.path.getsize(input_path)
+    budget = max_size_kb * 1024
+    if before <= budget:
+        return before, before
+
+    print(f"Compressing {os.path.basename(input_path)}...")
+    after = before
+    # Each attempt is written next to the input, and the smallest so far
+    # kept there
+    attempt_path = input_path + ".attempt.tmp"
+    best_path = input_path + ".best.tmp"
+    try:
+        best = None  # size of the file at best_path
+        total_pixels = 0  # of the images that can be compressed
+        image_bytes = 0
+        seen = set()
+        with open(input_path, 'rb') as file:
+            reader = PdfReader(file)
+            for page in reader.pages:
+                for reference in image_references(page, seen):
+                    xobject = reference.get_object()
+                    image = try_decode_image(xobject)
+                    if image is not None:
+                        total_pixels += image.width * image.height
+                        image_bytes += len(xobject._data)
+                        image.close()
+                # Only one page of the document is held in memory at a time
+                reader.resolved_objects.clear()
+        # Everything other than the images stays as large as it is. If that
+        # alone is over budget, the images still go down to the floors of
+        # compress_image(), in one attempt
+        image_budget = max(0, budget - (before - image_bytes) - COMPRESS_MARGIN)
+
+        for attempt in range(COMPRESS_ATTEMPTS):
+            if not total_pixels:
+                break
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(input_path))) as spill_dir:
+                def shrink(xobject):
+                    image = try_decode_image(xobject)
+                    if image is None:
+                        return
+                    with image:
+                        share = max(1, image_budget * image.width * image.height // total_pixels)
+                        data, size, passes = compress_image(image, share)
+                    if len(data) < len(xobject._data):
+                        replace_image_object(xobject, data, size)
+
+                writer = PdfWriter()
+                append_pages(writer, input_path, spill_dir, set(), shrink)
+                writer.write(attempt_path)
+                writer.close()
+            size = os.path.getsize(attempt_path)
+            if best is None or size < best:
+                os.replace(attempt_path, best_path)
+                best = size
+            if best <= budget or not image_budget:
+                break
+            image_budget = int(image_budget * budget / size * 0.9)
+
+        if best is not None and best < before:
+            os.replace(best_path, input_path)
+            after = best
+        if after <= budget:
+            print(f"Successfully compressed to {after // 1024} KB (from {before // 1024} KB)")
+        else:
+            print("Warning: Could not compress to target size while maintaining acceptable quality "
+                  f"({before // 1024} KB -> {after // 1024} KB)")
+
+    except Exception as e:
+        print(f"Error during compression: {str(e)}")
+    finally:
+        for path in (attempt_path, best_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return before, after
+
+def merge_category(folder_path, category, file_list, futures, compress=False):
+    """Build <category>.pdf from the converted files of one category.
+
+    `futures` holds the finished conversions of `file_list`, in the same
+    order, so the pages come out in file order however the workers were
+    scheduled. Each result is the path of a PDF, whose pages are copied,
+    or a page image, which becomes a new page. A file that failed to
+    convert is reported and left out. Returns whether every file made it
+    into the output, False also when every file failed and no PDF was
+    written, or None if there was nothing to merge because none of the
+    files is of a kind that converts.
+    """
+    print(f"\nProcessing {category} files:")
+    complete = True
+    converted = []  # (input path, PDF path or page image)
+    for file_path, future in zip(file_list, futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"  Converting: {os.path.basename(file_path)}")
+            print(f"  Failed to convert {os.path.basename(file_path)}: {str(e)}")
+            complete = False
+            continue
+        if isinstance(result, PageImage):
+            # Encode passes: 0 for a JPEG used as it is or a cached page
+            size = len(result.data) if result.data is not None else os.path.getsize(result.path)
+            print(f"  Converting: {os.path.basename(file_path)} ({size // 1024} KB, {result.passes} passes)")
+        else:
+            print(f"  Converting: {os.path.basename(file_path)}")
+        if result:
+            converted.append((file_path, result))
+
+    # Merge PDFs if there are any
+    if not converted:
+        return None if complete else False
+    writer = PdfWriter()
+    for file_path, result in converted:
+        try:
+            if isinstance(result, PageImage):
+                add_image_page(writer, result, page_resolution(compress))
+            else:
+                writer.append(result)
+        except Exception as e:
+            print(f"  Failed to add {os.path.basename(file_path)}: {str(e)}")
+            complete = False
+
+    # Save the merged PDF with category name
+    publish(folder_path, f"{category}.pdf", writer, compress)
+    print(f"  Created combined PDF: {category}.pdf")
+    return complete
+
+def load_composites(path):
+    """Read composite PDFs from a text file, one per line as "Name: Source, Source?, ...".
+
+    Blank lines and lines starting with # are skipped. Returns {name:
+    [sources]}, optional sources keeping their ?.
+    """
+    composites = {}
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, colon, sources = line.partition(':')
+            sources = [source.strip() for source in sources.split(',') if source.strip()]
+            if not colon or not name.strip() or not sources:
+                raise ValueError(f"{path}, line {number}: expected \"Name: Source, Source, ...\"")
+            composites[name.strip()] = sources
+    return composites
+
+def composite_order(composites, categories):
+    """Return the composite names in an order where sources come first.
+
+    Raises ValueError for a composite named like a category, an unknown
+    source or composites made of each other.
+    """
+    graph = {}
+    for name, sources in composites.items():
+        if name in categories:
+            raise ValueError(f"Composite {name} has the name of a category")
+        graph[name] = {source.rstrip('?') for source in sources}
+        for source in graph[name]:
+            if source not in categories and source not in composites:
+                raise ValueError(f"Composite {name} is made of {source}, which is neither a category nor a composite")
+    try:
+        order = list(graphlib.TopologicalSorter(graph).static_order())
+    except graphlib.CycleError as e:
+        raise ValueError(f"Composites made of each other: {' -> '.join(e.args[1])}") from None
+    return [name for name in order if name in composites]
+
+def build_composites(folder_path, composites=DEFAULT_COMPOSITES, categories=SEARCH_STRINGS,
+                     compress=False, previous=None, stream=False):
+    """Create the composite PDFs, such as OperationDocument from OTNotes and PAC.
+
+    Composites are built in dependency order once every required source
+    PDF exists, from those of their sources that do. Each category PDF is
+    parsed at most once, however many composites use it, and a composite
+    made of another composite takes its pages from that one's sources in
+    memory rather than reading it back. A composite whose source PDFs are
+    unchanged since its `previous` manifest record is left alone.
+
+    With `stream`, the source PDFs are instead read again for each
+    composite, a page at a time, with their images spilled to STATE_DIR,
+    so that only one page is held in memory.
+
+    Returns ({output name: manifest record}, [names of those rebuilt]).
+    """
+    previous = previous or {}
+    records = {}
+    rebuilt = []
+    pages = {}  # source -> its pages, parsed or gathered once
+
+    def source_files(source):
+        if source in composites:
+            return [path for part in present[source] for path in source_files(part)]
+        return [os.path.join(folder_path, f"{source}.pdf")]
+
+    def source_pages(source):
+        if source not in pages:
+            if source in composites:
+                pages[source] = [page for part in present[source] for page in source_pages(part)]
+            else:
+                pages[source] = list(PdfReader(os.path.join(folder_path, f"{source}.pdf")).pages)
+        return pages[source]
+
+    present = {}  # composite -> its sources that exist
+    for name in composite_order(composites, categories):
+        sources = [source.rstrip('?') for source in composites[name]]
+        required = [source for source in composites[name] if not source.endswith('?')]
+        available = [source for source in sources if (source in present if source in composites else
+                                                      os.path.exists(os.path.join(folder_path, f"{source}.pdf")))]
+        if not available or any(source not in available for source in required):
+            continue
+        present[name] = available
+
+        output = f"{name}.pdf"
+        record = {"inputs": [stamp(folder_path, f"{source}.pdf", {"name": f"{source}.pdf"}) for source in available],
+                  "compress": compress}
+        if up_to_date(folder_path, output, record, previous.get(output)):
+            print(f"\n{output} is up to date")
+            records[output] = previous[output]
+            continue
+
+        print()
+        if stream:
+            with tempfile.TemporaryDirectory(dir=os.path.join(folder_path, STATE_DIR)) as spill_dir:
+                writer = PdfWriter()
+                seen = set()
+                for source in available:
+                    for path in source_files(source):
+                        append_pages(writer, path, spill_dir, seen)
+                publish(folder_path, output, writer, compress)
+        else:
+            writer = PdfWriter()
+            for source in available:
+                for page in source_pages(source):
+                    writer.add_page(page)
+            publish(folder_path, output, writer, compress)
+        listed = " and ".join([", ".join(available[:-1]), available[-1]] if len(available) > 1 else available)
+        print(f"Created {output} by combining {listed}")
+        records[output] = stamp(folder_path, output, record)
+        rebuilt.append(output)
+    return records, rebuilt
+
+def build_folder(folder_path, compress=False, jobs=None, full=False, categorizer=None, composites=None,
+                 memory_limit=None):
+    """Build the category PDFs and the composite PDFs of one case folder.
+
+    Images are decoded, converted and encoded by `jobs` worker processes,
+    all categories at once. Each category is merged, in this process, as
+    soon as the last of its files is converted, while the workers carry on
+    with the other categories.
+
+    The build is incremental: a manifest in STATE_DIR records the size,
+    modification time and SHA-256 of every input and what each output was
+    built from. Outputs whose inputs are unchanged are skipped, and images
+    encoded by an earlier build are reused from STATE_DIR. `full` rebuilds
+    and re-encodes everything.
+
+    No intermediate PDFs are written: the workers return JPEG bytes, which
+    are embedded in the pages of the category PDF directly.
+
+    With a `memory_limit` in bytes the build streams instead: the workers
+    write the JPEGs to STATE_DIR and pass back their paths, and every page
+    image is read from its file only while the PDF is being written, so
+    no category is ever held in memory whole. Composites copy the pages
+    of their sources one at a time, spilling the images to files, as
+    compression always does. Fewer workers are started if the largest image would
+    not fit the limit in each of them.
+
+    Returns {"built": [...], "up_to_date": [...], "failed": [...]} with
+    the names of the output PDFs; a failed PDF is missing some files, or
+    was not written when none of them converted.
+    """
+    jobs = jobs or default_jobs()
+    stream = memory_limit is not None
+    state_path = os.path.join(folder_path, STATE_DIR)
+    if not os.path.isdir(folder_path):
+        # Not created by makedirs() below, so a mistyped folder is reported
+        raise FileNotFoundError(folder_path)
+    os.makedirs(state_path, exist_ok=True)
+    previous_build = load_manifest(folder_path)
+    manifest = {"inputs": {}, "outputs": {}} if full else previous_build
+
+    # Sorted, so that pages are merged in the same order on every machine.
+    # The outputs of earlier runs are not inputs, even those of categories
+    # no longer listed.
+    categorizer = categorizer or Categorizer()
+    composites = DEFAULT_COMPOSITES if composites is None else composites
+    outputs = output_names(categorizer.categories, composites) | set(previous_build["outputs"])
+    files = sorted(name for name in os.listdir(folder_path)
+                   if name not in outputs and os.path.isfile(os.path.join(folder_path, name)))
+    categorized_files, other_files = categorize_files(folder_path, files, categorizer)
+    categorized_files = {category: file_list for category, file_list in categorized_files.items() if file_list}
+    inputs = scan_inputs([path for file_list in categorized_files.values() for path in file_list],
+                         manifest["inputs"])
+
+    built = {}  # output name -> manifest record
+    stale = {}  # category -> manifest record to store once rebuilt
+    summary = {"built": [], "up_to_date": [], "failed": []}
+    for category, file_list in categorized_files.items():
+        name = f"{category}.pdf"
+        record = {"inputs": [[os.path.basename(path), inputs[os.path.basename(path)]["sha256"]]
+                             for path in file_list], "compress": compress}
+        previous = manifest["outputs"].get(name)
+        if up_to_date(folder_path, name, record, previous):
+            print(f"\n{name} is up to date")
+            built[name] = previous
+            summary["up_to_date"].append(name)
+        else:
+            stale[category] = record
+
+    def cache_name(file_path):
+        digest = inputs[os.path.basename(file_path)]["sha256"]
+        return f"{digest}{'-compressed' if compress else ''}.jpg"
+
+    # Page images by cache name, shared by identical images. JPEGs within
+    # the budget are used as they are; images encoded by an earlier build
+    # come from the cache; the rest are left to the workers.
+    pending = {}
+    for category in stale:
+        for file_path in categorized_files[category]:
+            name = cache_name(file_path)
+            if Path(file_path).suffix.lower() not in IMAGE_SUFFIXES or name in pending:
+                continue
+            page_image = original_page(file_path, compress, stream)
+            if page_image is None and not full and os.path.exists(os.path.join(state_path, name)):
+                page_image = read_page(os.path.join(state_path, name), stream)
+            pending[name] = done_future(page_image) if page_image else None
+
+    executor = None
+    to_encode = [name for name, future in pending.items() if future is None]
+    if to_encode and stream:
+        paths = {cache_name(path): path for category in stale for path in categorized_files[category]}
+        worker_memory = DECODE_COPIES * largest_image([paths[name] for name in to_encode])
+        if worker_memory:
+            jobs = max(1, min(jobs, (memory_limit - CASE_BASE_MEMORY) // worker_memory))
+    if to_encode:
+        if jobs > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(to_encode)))
+        else:
+            # A single worker: convert in this process, without starting a pool
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        conversions = {}
+        encoded = {}  # future -> cache name, for the pages encoded now
+        for category in stale:
+            conversions[category] = []
+            for file_path in categorized_files[category]:
+                if Path(file_path).suffix.lower() not in IMAGE_SUFFIXES:
+                    # PDFs are merged as they are; anything else is skipped
+                    conversions[category].append(done_future(convert_to_pdf(file_path)))
+                    continue
+                name = cache_name(file_path)
+                if pending[name] is None:
+                    spill_path = os.path.join(state_path, name) if stream else None
+                    pending[name] = executor.submit(encode_image, file_path, compress, spill_path)
+                    encoded[pending[name]] = name
+                conversions[category].append(pending[name])
+
+        waiting = {}  # conversion -> categories waiting for it
+        for category, futures in conversions.items():
+            for future in futures:
+                waiting.setdefault(future, set()).add(category)
+        remaining = {category: len(set(futures)) for category, futures in conversions.items()}
+        for future in concurrent.futures.as_completed(waiting):
+            if future in encoded and not future.exception() and future.result().data is not None:
+                write_atomic(os.path.join(state_path, encoded[future]), future.result().data)
+            for category in waiting[future]:
+                remaining[category] -= 1
+                if remaining[category]:
+                    continue
+                name = f"{category}.pdf"
+                complete = merge_category(folder_path, category, categorized_files[category],
+                                          conversions[category], compress)
+                if complete is None:
+                    # None of its files is of a kind that converts; there is no PDF to record
+                    continue
+                if complete:
+                    built[name] = stamp(folder_path, name, stale[category])
+                    summary["built"].append(name)
+                else:
+                    # A category with failed files is rebuilt by the next run
+                    summary["failed"].append(name)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    records, rebuilt = build_composites(folder_path, composites, categorizer.categories, compress,
+                                       manifest["outputs"], stream)
+    built.update(records)
+    summary["built"] += rebuilt
+    summary["up_to_date"] += [name for name in records if name not in rebuilt]
+
+    # Earlier outputs that were not rebuilt stay listed while they exist,
+    # so that they are never taken for inputs
+    for name, record in previous_build["outputs"].items():
+        if name not in built and os.path.exists(os.path.join(folder_path, name)):
+            built[name] = record
+    save_manifest(folder_path, {"inputs": inputs, "outputs": built})
+    # Drop cached pages that no current input needs, in either mode
+    keep = {f"{entry['sha256']}{suffix}.jpg" for entry in inputs.values() for suffix in ("", "-compressed")}
+    for entry in os.scandir(state_path):
+        if entry.name in (MANIFEST_FILE, LOG_FILE) or entry.name in keep:
+            continue
+        if entry.is_dir():
+            # Spilled images of a build that was stopped
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+    return summary
+
+def case_folders(root):
+    """Return the case folders directly under `root`, sorted by name."""
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))
+            if not name.startswith('.') and os.path.isdir(os.path.join(root, name))]
+
+def largest_image(paths):
+    """Bytes of the largest of the images at `paths` once decoded.
+
+    Only the file headers are read; files that are not images count 0.
+    """
+    largest = 0
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                largest = max(largest, image.width * image.height * len(image.getbands()))
+        except Exception:
+            pass
+    return largest
+
+def estimate_case_memory(folder_path, jobs):
+    """Rough peak memory of building one case folder with `jobs` workers, in bytes.
+
+    The merged PDFs hold every page at once, so the files count about
+    twice; each worker holds a few copies of the largest image it may
+    decode. Image sizes come from the file headers, nothing is decoded.
+    """
+    paths = [entry.path for entry in os.scandir(folder_path) if entry.is_file()]
+    images = [path for path in paths if Path(path).suffix.lower() in IMAGE_SUFFIXES]
+    total = sum(os.path.getsize(path) for path in paths)
+    return CASE_BASE_MEMORY + 2 * total + jobs * DECODE_COPIES * largest_image(images)
+
+def run_case(folder_path, compress, jobs, full, categories, composites, memory_limit=None):
+    """Build one case folder in batch mode, with its output going to LOG_FILE.
+
+    With a `memory_limit` in bytes the folder streams within it, as in
+    build_folder(). Returns the summary of build_folder() with the case
+    name, the time taken and the error that stopped the build, if any.
+    """
+    start = time.perf_counter()
+    result = {"case": os.path.basename(folder_path), "built": [], "up_to_date": [], "failed": [], "error": None}
+    try:
+        os.makedirs(os.path.join(folder_path, STATE_DIR), exist_ok=True)
+        with open(os.path.join(folder_path, STATE_DIR, LOG_FILE), 'w', encoding='utf-8') as log, \
+                contextlib.redirect_stdout(log):
+            try:
+                result.update(build_folder(folder_path, compress, jobs, full, Categorizer(categories), composites,
+                                           memory_limit))
+            except Exception as e:
+                print(f"An error occurred: {str(e)}")
+                raise
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+def format_case(result):
+    """One line of the batch summary for the result of run_case()."""
+    if result["error"]:
+        outcome = f"error: {result['error']}"
+    else:
+        outcome = f"{len(result['built'])} built, {len(result['up_to_date'])} up to date"
+        if result["failed"]:
+            outcome += f", incomplete: {', '.join(result['failed'])}"
+    return f"{result['case']}: {outcome} ({result['seconds']:.1f} s)"
+
+def build_batch(root, compress=False, jobs=None, cases=None, memory_limit=None, full=False,
+                categorizer=None, composites=None, summary_path=None):
+    """Build every case folder under `root`, several at a time.
+
+    Up to `cases` folders are built at once, each in its own process with
+    `jobs` / `cases` conversion workers, so that the machine stays busy
+    whether a folder has a few large scans or many small ones. With a
+    `memory_limit` in bytes, each running folder gets `memory_limit` /
+    `cases` of it: a folder whose estimated memory fits its share is built
+    as usual, a larger one streams within its share, so the folders
+    running together stay under the limit however large they are.
+
+    The output of each folder goes to its STATE_DIR/LOG_FILE, and a line
+    per folder is printed as it finishes, and appended as JSON to
+    `summary_path` if given. Returns the number of folders with errors or
+    missing files.
+    """
+    jobs = jobs or default_jobs()
+    cases = max(1, min(cases or jobs, jobs))
+    case_jobs = max(1, jobs // cases)
+    categories = (categorizer or Categorizer()).categories
+    case_limit = memory_limit // cases if memory_limit else None
+    waiting = []  # (folder, memory limit of its build)
+    for folder in case_folders(root):
+        if case_limit and estimate_case_memory(folder, case_jobs) > case_limit:
+            waiting.append((folder, case_limit))
+        else:
+            waiting.append((folder, None))
+    total = len(waiting)
+    print(f"Building {total} case folders, {cases} at a time with {case_jobs} workers each")
+
+    start = time.perf_counter()
+    finished = 0
+    problems = 0
+    running = set()
+    summary = open(summary_path, 'a', encoding='utf-8') if summary_path else None
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=cases) as executor:
+            while waiting or running:
+                while waiting and len(running) < cases:
+                    folder, limit = waiting.pop(0)
+                    running.add(executor.submit(run_case, folder, compress, case_jobs, full, categories,
+                                                composites, limit))
+
+                done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    finished += 1
+                    if result["error"] or result["failed"]:
+                        problems += 1
+                    print(f"[{finished}/{total}] {format_case(result)}", flush=True)
+                    if summary:
+                        summary.write(json.dumps(result) + "\n")
+                        summary.flush()
+    finally:
+        if summary:
+            summary.close()
+    print(f"Built {total} case folders in {time.perf_counter() - start:.1f} s, {problems} with problems")
+    return problems
+
+def folder_snapshot(folder_path, ignored):
+    """Return {name: (size, mtime_ns)} for the files of `folder_path` not in `ignored`."""
+    snapshot = {}
+    for entry in os.scandir(folder_path):
+        if entry.is_file() and entry.name not in ignored and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+def watch_folder(folder_path, compress=False, jobs=None, categorizer=None, composites=None,
+                 memory_limit=None, interval=WATCH_INTERVAL, settle=WATCH_SETTLE):
+    """Build `folder_path` again whenever its files change, until Ctrl+C.
+
+    The folder is polled every `interval` seconds. A build starts once no
+    file has been added, removed or changed in size or modification time
+    for `settle` seconds, so a scanner writing a batch of files, or one
+    large file, sets off one build after the last write. build_folder()
+    redoes only the PDFs whose files changed. The PDFs it writes, and its
+    state in STATE_DIR, are not looked at, so they never set off a build.
+    """
+    categorizer = categorizer or Categorizer()
+    composites = DEFAULT_COMPOSITES if composites is None else composites
+    print(f"Watching {folder_path} for changes (Ctrl+C to stop)")
+    built = None  # snapshot the last build started from
+    snapshot = None
+    changed_at = time.monotonic()
+    try:
+        while True:
+            outputs = output_names(categorizer.categories, composites) | set(load_manifest(folder_path)["outputs"])
+            current = folder_snapshot(folder_path, outputs)
+            if current != snapshot:
+                snapshot, changed_at = current, time.monotonic()
+            elif snapshot != built and time.monotonic() - changed_at >= settle:
+                built = snapshot
+                print(f"\n{time.strftime('%H:%M:%S')} Building {os.path.basename(folder_path)}")
+                try:
+                    build_folder(folder_path, compress, jobs, categorizer=categorizer, composites=composites,
+                                 memory_limit=memory_limit)
+                except Exception as e:
+                    # Tried again when the files change, e.g. once a locked file is closed
+                    print(f"An error occurred: {str(e)}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+def main(default_folder, compress=False, argv=None):
+    """Command line entry point of the PDF Maker scripts.
+
+    Returns the exit status: the number of case folders with problems in
+    batch mode, up to 255, else 1 if a file could not be converted or the build
+    failed, and 0 if all went well.
+    """
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Merge the scans of a case folder into one PDF per category.")
+    parser.add_argument("folder", nargs="?", default=default_folder,
+                        help="case folder (default: the folder of the script)")
+    parser.add_argument("--jobs", type=int, default=default_jobs(),
+                        help="number of files converted in parallel (default: one per CPU)")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild every PDF, even those whose files are unchanged")
+    parser.add_argument("--batch", action="store_true",
+                        help="treat the folder as a root and build every case folder in it")
+    parser.add_argument("--cases", type=int,
+                        help="case folders built at once in batch mode (default: --jobs)")
+    parser.add_argument("--memory", type=int,
+                        help="memory ceiling in MB: of the case folders built at once in batch mode, "
+                             "else of the build, which then streams pages from disk")
+    parser.add_argument("--summary",
+                        help="in batch mode, append the result of each case folder to this file as JSON lines")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and build the folder again whenever its files change")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE,
+                        help=f"seconds the files must stay unchanged before a build in watch mode (default: {WATCH_SETTLE})")
+    parser.add_argument("--categories", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), CATEGORIES_FILE),
+                        help=f"file of category names, one per line (default: {CATEGORIES_FILE} next to the scripts)")
+    parser.add_argument("--composites", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), COMPOSITES_FILE),
+                        help=f"file of composite PDFs, one per line (default: {COMPOSITES_FILE} next to the scripts)")
+    args = parser.parse_args(argv)
+    if args.watch and args.batch:
+        parser.error("--watch builds a single case folder, not --batch")
+
+    memory_limit = args.memory * 1024 * 1024 if args.memory else None
+
+    try:
+        if os.path.exists(args.categories):
+            categorizer = Categorizer(load_categories(args.categories))
+        else:
+            categorizer = Categorizer()
+        if os.path.exists(args.composites):
+            composites = load_composites(args.composites)
+        else:
+            composites = DEFAULT_COMPOSITES
+        # Check the rules before any folder is built
+        composite_order(composites, categorizer.categories)
+        if args.batch:
+            problems = build_batch(args.folder, compress, args.jobs, args.cases, memory_limit, args.full,
+                                   categorizer, composites, args.summary)
+            # Exit statuses wrap around at 256
+            return min(problems, 255)
+        elif args.watch:
+            watch_folder(args.folder, compress, args.jobs, categorizer, composites, memory_limit, settle=args.settle)
+            return 0
+        else:
+            summary = build_folder(args.folder, compress, args.jobs, args.full, categorizer, composites, memory_limit)
+            return 1 if summary["failed"] else 0
+    except FileNotFoundError:
+        print("Folder not found!")
+    except PermissionError:
+        print("Permission denied to access the folder!")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+    return 1
@@ -0,0 +1,158 @@
+"""Benchmarks for clipboard_core with synthetic snippet libraries.
+
+Run from the repository root:
+
+    python benchmarks/clipboard_benchmark.py
+    python benchmarks/clipboard_benchmark.py --sizes 1000 10000 --backend sqlite --json results.json
+
+For every library size it times loading (with and without the cached
+search index), searching, toggling the selection, composing the Selected
+Text panel, bulk import and saving changes, and reports the median and worst latency of each operation
+together with the peak memory allocated while it ran (measured in a
+separate pass under tracemalloc, so tracing does not distort the timings).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clipboard_core import DATA_FILE, INDEX_CACHE_FILE, Selection, compose_selected_text, import_items, open_library
+
+WORDS = ["Anesthesia", "note", "with", "sign", "stamp", "Submitted", "HPE", "report", "UPMCI",
+         "treating", "doctor", "surgeon", "OT", "Post", "OP", "Images", "patient", "Xray",
+         "Clinical", "Notes", "USG", "LFT", "pathologist", "sonologist", "reg", "number",
+         "Aadhar", "card", "government", "ID", "proof", "Discharge", "Summary", "vitals"]
+
+def synthetic_items(count, seed=0):
+    """Return `count` snippet texts resembling the real library."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+        items.append(f"{text} {i},")
+    return items
+
+def measure(function, repeat):
+    """Return (median ms, worst ms, peak KiB) for calling `function` `repeat` times."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(durations), max(durations), peak / 1024
+
+def run_size(size, backend, repeat):
+    """Run every operation against a library of `size` items."""
+    results = []
+
+    def record(operation, function, times=repeat):
+        median, worst, peak = measure(function, times)
+        results.append({"size": size, "backend": backend, "operation": operation,
+                        "median_ms": round(median, 3), "max_ms": round(worst, 3),
+                        "peak_kib": round(peak, 1)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, DATA_FILE), "w") as file:
+            file.writelines(f"{text}\n" for text in synthetic_items(size))
+
+        # The first open imports the plain-text file; later opens load the store
+        library = open_library(backend, directory)
+        library.close()
+
+        def load():
+            library = open_library(backend, directory)
+            library.finish_loading()
+            library.close()
+
+        def load_cold():
+            # Without the cached search index the whole library is indexed
+            cache_path = os.path.join(directory, INDEX_CACHE_FILE)
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            load()
+
+        record("load_cold", load_cold, times=max(1, repeat // 5))
+        record("load", load, times=max(1, repeat // 5))
+        library = open_library(backend, directory)
+        library.finish_loading()
+        ids = list(library.ids())
+        rng = random.Random(1)
+
+        def search(text, fuzzy=False):
+            def run():
+                result = library.search(text, fuzzy)
+                # Touch the first screenful, as the list would
+                for position in range(min(len(result), 10)):
+                    library.text(result[position])
+            return run
+
+        record("search_prefix", search("Anesthesia note"))
+        record("search_substring", search("stamp Submitted"))
+        record("search_short", search("ot"))
+        record("search_miss", search("no such snippet"))
+        record("search_fuzzy", search("Anestesia nte", fuzzy=True))
+        record("search_fuzzy_short", search("UPMCI", fuzzy=True))
+
+        selection = Selection()
+        picks = rng.sample(ids, min(len(ids), 50))
+
+        def toggle():
+            for item_id in picks:
+                selection.add(item_id)
+            for item_id in picks[::2]:
+                selection.discard(item_id)
+            for item_id in picks[::2]:
+                selection.add(item_id)
+
+        record("toggle_x100", toggle)
+        record("compose_panel", lambda: compose_selected_text(library.text(item_id) for item_id in selection))
+
+        batches = iter(range(repeat + 1))
+
+        def bulk_import():
+            batch = next(batches)
+            import_items(library, (f"Imported snippet {batch}-{i}" for i in range(1000)))
+
+        record("import_x1000", bulk_import)
+
+        added = []
+        record("save_add", lambda: added.append(library.add("Benchmark snippet\nsecond line")))
+        record("save_edit", lambda: library.edit(rng.choice(ids), "Edited benchmark snippet"))
+        record("save_delete", lambda: library.delete(added.pop()), times=len(added) - 1)
+        library.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per operation")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'size':>7}  {'operation':<18}{'median ms':>11}{'max ms':>11}{'peak KiB':>11}")
+    for size in args.sizes:
+        for row in run_size(size, args.backend, args.repeat):
+            results.append(row)
+            print(f"{row['size']:>7}  {row['operation']:<18}{row['median_ms']:>11.3f}"
+                  f"{row['max_ms']:>11.3f}{row['peak_kib']:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Benchmarks for the PDF Maker with synthetic case folders.
+
+Run from the repository root:
+
+    python benchmarks/pdf_maker_benchmark.py
+    python benchmarks/pdf_maker_benchmark.py --files 20 100 --jobs 1 --json results.json
+    python benchmarks/pdf_maker_benchmark.py --files 200 --memory 300
+
+For every case size it generates a case folder of phone photos, scanned
+pages, small forwarded JPEGs, PNG screenshots and scanned PDFs spread over
+the categories, and builds it from scratch with the plain and the
+compressing pipeline. Each build runs in a fresh process, which reports
+its wall and CPU time, bytes read and written, and peak RSS, in total and
+per stage: hashing, JPEG pass-through, decoding, convert, resize, JPEG
+encoding, the quality search of compress_image(), page building,
+PdfReader, append, write, compress_pdf and the composite PDFs. --memory
+builds streaming, as the scripts do with --memory, which adds the pages
+read from disk while the PDFs are written.
+
+Stages nest, e.g. decode and resize run inside encode_image; "self" is
+the time spent in a stage outside the stages it calls. Bytes are counted
+by the innermost file operations only, so they add up to the total. With
+--jobs above 1 images are encoded in worker processes, whose work shows in
+the wall and CPU totals only; the default of one worker keeps the whole
+build in view. Peak RSS per stage is the largest resident size seen
+while the stage ran, sampled every few milliseconds; it needs Linux or
+psutil.
+"""
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PDF Maker"))
+
+from PIL import Image, ImageDraw, ImageFile
+from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+
+import pdf_maker_core
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Kinds of input file: (weight, suffix, size in pixels, JPEG quality)
+INPUT_KINDS = {
+    "photo": (25, ".jpg", (3024, 4032), 92),
+    "scan": (25, ".jpg", (2480, 3508), 85),
+    "forwarded": (20, ".jpg", (960, 1280), 70),
+    "screenshot": (15, ".png", (1080, 2340), None),
+    "pdf": (15, ".pdf", (1240, 1754), 80),
+}
+
+# Seconds between the RSS samples taken while a build runs
+SAMPLE_INTERVAL = 0.005
+
+def synthetic_image(rng, size, noise):
+    """Return an RGB page with lines of "text" over a noisy background."""
+    width, height = size
+    image = Image.merge("RGB", [noise.resize(size)] * 3)
+    draw = ImageDraw.Draw(image)
+    line_height = max(12, height // 60)
+    for top in range(line_height * 3, height - line_height * 3, line_height * 2):
+        left = width // 12
+        while left < width * 11 // 12:
+            word = rng.randint(width // 40, width // 8)
+            draw.rectangle([left, top, min(left + word, width * 11 // 12), top + line_height], fill=(30, 30, 40))
+            left += word + width // 60
+    return image
+
+def make_case(folder_path, files, seed=0):
+    """Fill `folder_path` with `files` inputs spread over the categories.
+
+    Every category gets files in turn, OTNotes and PAC first, so that the
+    OperationDocument is built too. Returns {kind: count}.
+    """
+    rng = random.Random(seed)
+    categories = ["OTNotes", "PAC"] + [category for category in pdf_maker_core.SEARCH_STRINGS
+                                       if category not in ("OTNotes", "PAC")]
+    noise = Image.effect_noise((512, 512), 40).point(lambda value: 160 + value // 3)
+    kinds = list(INPUT_KINDS)
+    weights = [INPUT_KINDS[kind][0] for kind in kinds]
+    counts = collections.Counter()
+    os.makedirs(folder_path, exist_ok=True)
+    for number in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        weight, suffix, size, quality = INPUT_KINDS[kind]
+        name = f"{categories[number % len(categories)]}_{number}{suffix}"
+        path = os.path.join(folder_path, name)
+        if kind == "pdf":
+            pages = [synthetic_image(rng, size, noise) for _ in range(rng.randint(1, 3))]
+            pages[0].save(path, "PDF", resolution=150, save_all=True, append_images=pages[1:], quality=quality)
+        elif quality is None:
+            synthetic_image(rng, size, noise).save(path)
+        else:
+            synthetic_image(rng, size, noise).save(path, quality=quality)
+        counts[kind] += 1
+    return dict(counts)
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def file_size(path):
+    """Size of the file at `path`, or 0 if it is not a path."""
+    return os.path.getsize(path) if isinstance(path, (str, os.PathLike)) else 0
+
+def page_bytes(page_image):
+    """Bytes of a page image read into memory; none for a streamed one."""
+    return len(page_image.data) if page_image and page_image.data is not None else 0
+
+class StageRecorder:
+    """Wall time, CPU time, bytes and peak RSS of each stage of a build."""
+
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.active = collections.Counter()
+        self.peak_rss = 0
+        self.running = True
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = stage = {"calls": 0, "wall_ms": 0.0, "self_ms": 0.0, "cpu_ms": 0.0,
+                                         "self_cpu_ms": 0.0, "bytes_read": 0, "bytes_written": 0,
+                                         "peak_rss_kib": 0}
+        return stage
+
+    def observe(self, names=None):
+        """Record the current RSS against the active stages, or `names`."""
+        rss = current_rss()
+        if rss is None:
+            return
+        with self.lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            for name in names or list(self.active):
+                stage = self.stage(name)
+                stage["peak_rss_kib"] = max(stage["peak_rss_kib"], rss // 1024)
+
+    def sample(self):
+        while self.running:
+            self.observe()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self.running = False
+        self.sampler.join()
+
+    def wrap(self, name, function, before=None, io_bytes=None):
+        """Return `function` timed as stage `name`.
+
+        `before(args)` runs first and its result is passed on to
+        `io_bytes(args, result, state)`, which returns (bytes read, bytes
+        written). A stage called from within itself is only counted once.
+        """
+        recorder = self
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack = recorder.local.__dict__.setdefault("stack", [])
+            if any(frame[0] == name for frame in stack):
+                return function(*args, **kwargs)
+            state = before(args) if before else None
+            frame = [name, 0.0, 0.0]  # name, wall and CPU time of the stages it called
+            stack.append(frame)
+            with recorder.lock:
+                recorder.active[name] += 1
+            recorder.observe([name])
+            start, start_cpu = time.perf_counter(), time.thread_time()
+            read = written = 0
+            try:
+                result = function(*args, **kwargs)
+                if io_bytes:
+                    read, written = io_bytes(args, result, state)
+                return result
+            finally:
+                wall = (time.perf_counter() - start) * 1000
+                cpu = (time.thread_time() - start_cpu) * 1000
+                stack.pop()
+                if stack:
+                    stack[-1][1] += wall
+                    stack[-1][2] += cpu
+                recorder.observe([name])
+                with recorder.lock:
+                    recorder.active[name] -= 1
+                    if not recorder.active[name]:
+                        del recorder.active[name]
+                    stage = recorder.stage(name)
+                    stage["calls"] += 1
+                    stage["wall_ms"] += wall
+                    stage["self_ms"] += wall - frame[1]
+                    stage["cpu_ms"] += cpu
+                    stage["self_cpu_ms"] += cpu - frame[2]
+                    stage["bytes_read"] += read
+                    stage["bytes_written"] += written
+        return wrapper
+
+    def patch(self, owner, attribute, name, before=None, io_bytes=None):
+        setattr(owner, attribute, self.wrap(name, getattr(owner, attribute), before, io_bytes))
+
+def instrument(recorder):
+    """Time the stages of pdf_maker_core, Pillow and PyPDF2 in this process."""
+    core = pdf_maker_core
+    recorder.patch(core, "file_digest", "hash", io_bytes=lambda args, result, state: (file_size(args[0]), 0))
+    recorder.patch(core, "original_page", "jpeg_passthrough",
+                   io_bytes=lambda args, result, state: (page_bytes(result), 0))
+    recorder.patch(core, "read_page", "page_cache_read", io_bytes=lambda args, result, state: (page_bytes(result), 0))
+    recorder.patch(core.FileStreamObject, "write_to_stream", "page_stream",
+                   io_bytes=lambda args, result, state: (file_size(args[0].path), 0))
+    recorder.patch(core, "write_atomic", "write_atomic",
+                   before=lambda args: len(args[1]), io_bytes=lambda args, result, state: (0, state))
+    recorder.patch(core, "encode_image", "encode_image")
+    recorder.patch(core, "compress_image", "quality_loop")
+    recorder.patch(core, "add_image_page", "add_image_page")
+    recorder.patch(core, "merge_category", "merge_category")
+    recorder.patch(core, "compress_pdf", "compress_pdf")
+    recorder.patch(core, "build_composites", "composites")
+    # A file image is decoded, and its file read, by the first load()
+    recorder.patch(ImageFile.ImageFile, "load", "decode",
+                   before=lambda args: args[0].tile and getattr(args[0], "filename", "") or None,
+                   io_bytes=lambda args, result, state: (file_size(state) if state else 0, 0))
+    recorder.patch(Image.Image, "convert", "convert")
+    recorder.patch(Image.Image, "resize", "resize")
+    recorder.patch(Image.Image, "save", "jpeg_encode")
+    recorder.patch(PdfReader, "__init__", "pdf_read",
+                   before=lambda args: file_size(args[1]) if len(args) > 1 else 0,
+                   io_bytes=lambda args, result, state: (state, 0))
+    for writer in (PdfWriter, PdfMerger):
+        # Appending a path opens the file and hands PdfReader the stream
+        recorder.patch(writer, "append", "pdf_append",
+                       io_bytes=lambda args, result, state: (file_size(args[1]) if len(args) > 1 else 0, 0))
+        recorder.patch(writer, "write", "pdf_write",
+                       io_bytes=lambda args, result, state: (0, file_size(args[1]) if len(args) > 1 else 0))
+
+def run_build(folder_path, compress, jobs, memory_limit=None):
+    """Build `folder_path` from scratch in this process and return its measurements.
+
+    Meant to run in a fresh process, so that peak RSS is the build's own.
+    """
+    recorder = StageRecorder()
+    instrument(recorder)
+    start, start_times = time.perf_counter(), os.times()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        pdf_maker_core.build_folder(folder_path, compress, jobs, full=True, memory_limit=memory_limit)
+    wall = (time.perf_counter() - start) * 1000
+    times = os.times()
+    recorder.stop()
+    recorder.observe()
+    cpu = sum(times[:4]) - sum(start_times[:4])
+
+    peak_rss = recorder.peak_rss
+    try:
+        import resource
+        # Kilobytes on Linux, bytes on macOS
+        peak_rss = max(peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       * (1 if sys.platform == "darwin" else 1024))
+    except ImportError:
+        pass
+    outputs = [name for name in pdf_maker_core.output_names() if os.path.exists(os.path.join(folder_path, name))]
+    stages = [dict(stage=name, **{key: round(value, 3) if isinstance(value, float) else value
+                                  for key, value in stage.items()})
+              for name, stage in sorted(recorder.stages.items(), key=lambda item: -item[1]["self_ms"])]
+    return {"wall_ms": round(wall, 3), "cpu_ms": round(cpu * 1000, 3),
+            "bytes_read": sum(stage["bytes_read"] for stage in stages),
+            "bytes_written": sum(stage["bytes_written"] for stage in stages),
+            "peak_rss_kib": peak_rss // 1024,
+            "outputs": len(outputs),
+            "output_kib": sum(os.path.getsize(os.path.join(folder_path, name)) for name in outputs) // 1024,
+            "stages": stages}
+
+def run_size(files, jobs, pipelines, memory_limit=None):
+    """Generate a case folder of `files` inputs and build it with each pipeline.
+
+    With a `memory_limit` in bytes the builds stream, as with --memory.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        case_path = os.path.join(directory, "case")
+        start = time.perf_counter()
+        kinds = make_case(case_path, files)
+        input_kib = sum(entry.stat().st_size for entry in os.scandir(case_path)) // 1024
+        print(f"\nGenerated {files} files ({input_kib} KiB: "
+              f"{', '.join(f'{count} {kind}' for kind, count in sorted(kinds.items()))}) "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        for pipeline in pipelines:
+            build_path = os.path.join(directory, pipeline)
+            shutil.copytree(case_path, build_path)
+            # A fresh process for every build, so peak RSS is the build's own
+            context = multiprocessing.get_context("spawn")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_build, build_path, pipeline == "compress", jobs,
+                                         memory_limit).result()
+            shutil.rmtree(build_path)
+            results.append(dict(files=files, input_kib=input_kib, pipeline=pipeline, jobs=jobs,
+                                streaming=memory_limit is not None, **result))
+    return results
+
+def print_result(result):
+    print(f"\n{result['files']} files, {result['pipeline']} pipeline{' (streaming)' if result['streaming'] else ''}, "
+          f"{result['jobs']} jobs: "
+          f"{result['wall_ms'] / 1000:.2f} s wall, {result['cpu_ms'] / 1000:.2f} s CPU, "
+          f"read {result['bytes_read'] // 1024} KiB, wrote {result['bytes_written'] // 1024} KiB, "
+          f"peak RSS {result['peak_rss_kib'] // 1024} MiB, {result['outputs']} PDFs of {result['output_kib']} KiB")
+    print(f"  {'stage':<20}{'calls':>7}{'wall ms':>11}{'self ms':>11}{'CPU ms':>11}"
+          f"{'read KiB':>11}{'write KiB':>11}{'RSS MiB':>9}")
+    for stage in result["stages"]:
+        print(f"  {stage['stage']:<20}{stage['calls']:>7}{stage['wall_ms']:>11.1f}{stage['self_ms']:>11.1f}"
+              f"{stage['cpu_ms']:>11.1f}{stage['bytes_read'] // 1024:>11}{stage['bytes_written'] // 1024:>11}"
+              f"{stage['peak_rss_kib'] // 1024:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[20, 60], help="input files per case folder")
+    parser.add_argument("--jobs", type=int, default=1, help="conversion workers of each build")
+    parser.add_argument("--pipelines", nargs="+", choices=["plain", "compress"], default=["plain", "compress"])
+    parser.add_argument("--memory", type=int, help="build streaming with this memory ceiling in MB")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for files in args.files:
+        for result in run_size(files, args.jobs, args.pipelines,
+                               args.memory * 1024 * 1024 if args.memory else None):
+            results.append(result)
+            print_result(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1142 @@
+"""Data model of the Clipboard Data App, independent of Tk.
+
+Storage, searching, the selection and the text of the Selected Text panel
+live here so they can be used, timed and tested without opening a window.
+"Clipboard Data App.py" builds the user interface on top of this module.
+"""
+import array
+import bisect
+import collections
+import csv
+import hashlib
+import heapq
+import json
+import marshal
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+
+from clipboard_perf import timings
+
+# Old plain-text file, imported once into the journaled store
+DATA_FILE = "clipboard_data.txt"
+
+# Files of the journaled store
+SNAPSHOT_FILE = "clipboard_data.snapshot"
+JOURNAL_FILE = "clipboard_data.journal"
+
+# Fold the journal into a new snapshot once it grows past this size
+COMPACT_BYTES = 1024 * 1024
+
+# Search index of the in-memory backend, saved on exit and reused by the
+# next start while the store is unchanged
+INDEX_CACHE_FILE = "clipboard_data.index"
+INDEX_CACHE_VERSION = 1
+
+# Items indexed per step while the app starts, between paints of the window
+LOAD_CHUNK = 1000
+
+# Number of results shown in fuzzy search mode
+FUZZY_LIMIT = 30
+# Fuzzy queries up to this long may lose all their trigrams to one typo, so
+# their candidates are found by pairs of letters instead
+FUZZY_SHORT_QUERY = 6
+
+# Storage backend: "memory" (journaled store, searched in memory) or
+# "sqlite" (SQLite database with an FTS5 index, for very large libraries)
+BACKEND = os.environ.get("CLIPBOARD_BACKEND", "memory")
+DATABASE_FILE = "clipboard_data.sqlite3"
+
+# Snapshot file layout: magic, last journal sequence number, record count
+# and offset of the record index
+SNAPSHOT_MAGIC = b"CLIPREC1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+RECORD_LENGTH = struct.Struct("<I")
+
+def load_data(path=DATA_FILE):
+    """Load text data from a plain-text file (one item per line)."""
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            return [line.strip() for line in file.readlines()]
+    return []
+
+def write_record_file(path, texts, seq):
+    """Atomically write `texts` as a snapshot of length-prefixed records."""
+    temp_path = path + ".tmp"
+    offsets = array.array("Q")
+    with open(temp_path, "wb") as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 0, 0, 0))
+        for text in texts:
+            data = text.encode("utf-8")
+            offsets.append(file.tell())
+            file.write(RECORD_LENGTH.pack(len(data)))
+            file.write(data)
+        index_offset = file.tell()
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        file.write(offsets.tobytes())
+        file.seek(0)
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, seq, len(offsets), index_offset))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+class RecordFile:
+    """Read-only, memory-mapped snapshot of length-prefixed UTF-8 records.
+
+    The records are followed by an index of their offsets, so opening the
+    file only reads the header and the index; each text is decoded from the
+    map when it is asked for. Texts may contain newlines.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < SNAPSHOT_HEADER.size:
+            # E.g. an older JSON-lines snapshot of an empty library
+            self.file.close()
+            raise ValueError(f"{path} is not a record file")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.seq, count, index_offset = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a record file")
+        self.offsets = array.array("Q")
+        self.offsets.frombytes(self.map[index_offset:index_offset + count * self.offsets.itemsize])
+        if sys.byteorder == "big":
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        offset = self.offsets[index]
+        (length,) = RECORD_LENGTH.unpack_from(self.map, offset)
+        start = offset + RECORD_LENGTH.size
+        return self.map[start:start + length].decode("utf-8")
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+class JournalStore:
+    """Item storage as a snapshot plus an append-only journal of mutations.
+
+    Every add, edit and delete appends one small JSON record to the journal
+    and fsyncs it, so a mutation costs the same however big the library is
+    and a crash can at worst lose the record being written. Once the journal
+    passes `compact_bytes` it is renamed aside and a background thread writes
+    a new snapshot of the items. Records carry increasing sequence numbers
+    and the snapshot stores the last one it includes, so replaying after a
+    crash at any point never applies a record twice.
+
+    The snapshot is a RecordFile. It stays mapped while the app runs, so
+    compaction writes the next one alongside it and load() swaps it in on
+    the following start.
+
+    load() returns the item list; the caller mutates that list and then
+    reports the change with add/edit/delete. Entries are either a text or
+    the number of an unchanged record in the snapshot, which text() reads
+    on demand.
+    """
+
+    def __init__(self, snapshot_path, journal_path, legacy_path=None, compact_bytes=COMPACT_BYTES):
+        self.snapshot_path = snapshot_path
+        self.next_path = snapshot_path + ".next"
+        self.journal_path = journal_path
+        self.rotated_path = journal_path + ".old"
+        self.legacy_path = legacy_path
+        self.compact_bytes = compact_bytes
+        self.records = None
+        self.items = []
+        self.seq = 0
+        self.journal = None
+        self.compactor = None
+        self.snapshot_stat = None
+
+    def load(self):
+        """Map the snapshot and replay the journal on top of it."""
+        if os.path.exists(self.next_path):
+            # Written by a compaction while the old snapshot was mapped
+            os.replace(self.next_path, self.snapshot_path)
+        journals = [path for path in (self.rotated_path, self.journal_path) if os.path.exists(path)]
+
+        if not journals and not os.path.exists(self.snapshot_path) and self.legacy_path:
+            # First start with the journaled store: import the old text file
+            if os.path.exists(self.legacy_path):
+                write_record_file(self.snapshot_path, load_data(self.legacy_path), 0)
+
+        items, self.seq = self.read_snapshot()
+        for path in journals:
+            good_length = self.replay(path, items)
+            if good_length < os.path.getsize(path):
+                # Drop a record torn by a crash so that records written or
+                # copied after it by compact() start cleanly
+                with open(path, "r+b") as file:
+                    file.truncate(good_length)
+
+        self.items = items
+        self.journal = open(self.journal_path, "ab")
+        if (os.path.exists(self.rotated_path) or self.journal.tell() > self.compact_bytes
+                or self.records is None and items):
+            self.compact()
+        return items
+
+    def read_snapshot(self):
+        """Return (items, last sequence number) from the snapshot file."""
+        if not os.path.exists(self.snapshot_path):
+            return [], 0
+        stat = os.stat(self.snapshot_path)
+        self.snapshot_stat = (stat.st_mtime_ns, stat.st_size)
+        try:
+            self.records = RecordFile(self.snapshot_path)
+        except ValueError:
+            # Snapshot from before the record format: JSON lines, after a
+            # JSON header; load() converts it with a compaction
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                header = json.loads(file.readline())
+                return [json.loads(line) for line in file], header["seq"]
+        return list(range(len(self.records))), self.records.seq
+
+    def version(self):
+        """Return a value that changes whenever the loaded items change.
+
+        Made of the size and modification time of the snapshot file as
+        loaded plus the last sequence number, which every mutation increases.
+        """
+        return (self.snapshot_stat, self.seq)
+
+    def text(self, entry):
+        """Return the text of an entry of the item list."""
+        if isinstance(entry, str):
+            return entry
+        return self.records[entry]
+
+    def texts(self):
+        """Load the store and return all items as texts."""
+        return [self.text(entry) for entry in self.load()]
+
+    def replay(self, path, items):
+        """Apply the records of one journal file to `items`.
+
+        Records at or below the last sequence number applied, from the
+        snapshot or an earlier journal, are skipped: a crash while compact()
+        copies the journal leaves the copied records in both files.
+        Returns the length of the file up to the last complete record.
+        """
+        good_length = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                good_length += len(line)
+                if record["seq"] <= self.seq:
+                    continue
+                self.seq = record["seq"]
+                if record["op"] == "add":
+                    items.append(record["text"])
+                elif record["op"] == "edit":
+                    items[record["index"]] = record["text"]
+                elif record["op"] == "delete":
+                    del items[record["index"]]
+        return good_length
+
+    def add(self, text):
+        """Record that `text` was appended to the items."""
+        self.write_record({"op": "add", "text": text})
+
+    def add_many(self, texts):
+        """Record that `texts` were appended, with a single write and fsync."""
+        self.write_records([{"op": "add", "text": text} for text in texts])
+
+    def edit(self, index, text):
+        """Record that the item at `index` was changed to `text`."""
+        self.write_record({"op": "edit", "index": index, "text": text})
+
+    def delete(self, index):
+        """Record that the item at `index` was removed."""
+        self.write_record({"op": "delete", "index": index})
+
+    def write_record(self, record):
+        self.write_records([record])
+
+    @timings.timed("save_data")
+    def write_records(self, records):
+        lines = []
+        for record in records:
+            self.seq += 1
+            record["seq"] = self.seq
+            lines.append(json.dumps(record).encode("utf-8") + b"\n")
+        self.journal.write(b"".join(lines))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        if self.journal.tell() > self.compact_bytes:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a new snapshot on a background thread."""
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        if os.path.exists(self.rotated_path):
+            # A previous compaction did not finish; its records are still
+            # needed until a snapshot covering them has been written
+            self.journal.close()
+            with open(self.journal_path, "rb") as source, open(self.rotated_path, "ab") as target:
+                target.write(source.read())
+                target.flush()
+                os.fsync(target.fileno())
+        else:
+            self.journal.close()
+            os.replace(self.journal_path, self.rotated_path)
+        self.journal = open(self.journal_path, "wb")
+
+        items = list(self.items)
+        seq = self.seq
+
+        def run():
+            write_record_file(self.next_path, map(self.text, items), seq)
+            os.remove(self.rotated_path)
+
+        self.compactor = threading.Thread(target=run)
+        self.compactor.start()
+
+    def close(self):
+        """Wait for a running compaction and close the files."""
+        if self.compactor is not None:
+            self.compactor.join()
+        if self.journal is not None:
+            self.journal.close()
+        if self.records is not None:
+            self.records.close()
+
+def trigrams(text):
+    """Return the set of three-character substrings of `text`."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def letter_pairs(text):
+    """Return the adjacent letter pairs of `text` and of its one-letter deletions.
+
+    That is every pair of letters one or two apart. Swapping two letters
+    keeps at least one of them adjacent, so a short query still shares a
+    pair with the text it was mistyped from.
+    """
+    return {text[i:i + 2] for i in range(len(text) - 1)} | {text[i] + text[i + 2] for i in range(len(text) - 2)}
+
+def substring_distance(query, text):
+    """Return the smallest edit distance between `query` and any substring of `text`.
+
+    Swapping two adjacent letters counts as one edit (optimal string
+    alignment distance), so "upcmi" is one edit from "upmci".
+    """
+    # Sellers' algorithm: edit distance where the match may start anywhere
+    before = None
+    previous = list(range(len(query) + 1))
+    best = previous[-1]
+    last_char = None
+    for char in text:
+        current = [0]
+        for i, query_char in enumerate(query, 1):
+            distance = min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + (query_char != char))
+            if before is not None and i > 1 and query_char == last_char and query[i - 2] == char:
+                distance = min(distance, before[i - 2] + 1)
+            current.append(distance)
+        best = min(best, current[-1])
+        before, previous, last_char = previous, current, char
+    return best
+
+def rank_fuzzy(query, overlaps, text, limit, sizes=None):
+    """Return the ids of the `limit` items that best match `query` despite typos.
+
+    `overlaps` maps item id -> number of the query's trigrams (or
+    letter_pairs() for short queries) in the item and `sizes` optionally
+    maps item id -> number of trigrams in the item. Only the best few
+    candidates by overlap are scored in full with the edit distance;
+    candidates needing more than a third of the query's characters changed
+    are dropped.
+    """
+    if sizes is None:
+        coarse = overlaps.get
+    else:
+        # Prefer items whose trigrams are mostly the query's (Dice coefficient)
+        coarse = lambda item_id: (overlaps[item_id], overlaps[item_id] / (sizes[item_id] + 1))
+    candidates = heapq.nlargest(limit * 3, overlaps, key=coarse)
+
+    max_distance = max(1, len(query) // 3)
+    scored = []
+    for item_id in candidates:
+        distance = substring_distance(query, text(item_id).lower())
+        if distance <= max_distance:
+            scored.append((distance, -overlaps[item_id], item_id))
+    return [item_id for distance, overlap, item_id in heapq.nsmallest(limit, scored)]
+
+class SearchResult:
+    """Item ids ordered for display: matches first, then everything else.
+
+    Only the matching ids are stored; the remaining items are worked out on
+    demand from their positions, so building a result costs time in
+    proportion to the number of matches rather than the size of the library.
+    """
+
+    def __init__(self, matches, sorted_matches, ids):
+        self.matches = matches
+        self.ids = ids
+        self.total = len(ids)
+        # gaps[j] is the number of non-matching items before the j-th match
+        self.gaps = [index - j for j, index in enumerate(sorted_matches)]
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.total
+        if not 0 <= position < self.total:
+            raise IndexError("search result index out of range")
+        if position < len(self.matches):
+            return self.matches[position]
+        # The k-th item that is not a match
+        k = position - len(self.matches)
+        return self.ids[k + bisect.bisect_right(self.gaps, k)]
+
+class SearchIndex:
+    """Lowercase copies of a list of items plus a trigram inverted index.
+
+    Kept in step with the list by MemoryLibrary. Every item gets a stable id
+    that never changes while it exists; ids are handed out in increasing
+    order, so sorting ids gives the order of the list. Searches run on the
+    SearchScheduler worker thread, so every public method holds `lock`.
+    """
+
+    def __init__(self, texts=()):
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.ids = []  # item ids, in list order
+        self.lower = {}  # item id -> lowercase text
+        self.postings = {}  # trigram -> set of item ids
+        self.sizes = {}  # item id -> number of distinct trigrams, for fuzzy ranking
+        self.short = set()  # ids of items too short to contain a trigram
+        for text in texts:
+            self.append(text)
+
+    def append(self, text):
+        """Index a text added at the end of the list; returns its id."""
+        with self.lock:
+            item_id = self.next_id
+            self.next_id += 1
+            self.ids.append(item_id)
+            self._add(item_id, text)
+            return item_id
+
+    def replace(self, index, text):
+        """Re-index the item at `index` after it was edited."""
+        with self.lock:
+            item_id = self.ids[index]
+            self._discard(item_id)
+            self._add(item_id, text)
+
+    def remove(self, index):
+        """Drop the item at `index` after it was deleted from the list."""
+        with self.lock:
+            self._discard(self.ids.pop(index))
+
+    def posting(self, gram):
+        """Return the set of ids of items containing `gram`, or None."""
+        ids = self.postings.get(gram)
+        if ids.__class__ is bytes:
+            # Still packed as loaded from the cache; unpack on first use
+            packed = array.array("I")
+            packed.frombytes(ids)
+            self.postings[gram] = ids = set(packed)
+        return ids
+
+    def save(self, path, version):
+        """Atomically write the index to `path`, tagged with the store `version`."""
+        with self.lock:
+            postings = {gram: ids if ids.__class__ is bytes else array.array("I", ids).tobytes()
+                        for gram, ids in self.postings.items()}
+            data = marshal.dumps((INDEX_CACHE_VERSION, version, self.next_id, self.ids,
+                                  [self.lower[item_id] for item_id in self.ids],
+                                  [self.sizes[item_id] for item_id in self.ids], postings))
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def load(self, path, version):
+        """Replace the index with the one saved at `path` if it matches `version`.
+
+        Returns whether the cache was used. Posting sets stay packed in
+        bytes until a search or change needs them, so loading costs little
+        more than reading the file.
+        """
+        try:
+            with open(path, "rb") as file:
+                data = marshal.loads(file.read())
+            cache_version, cached_version, next_id, ids, lower, sizes, postings = data
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if cache_version != INDEX_CACHE_VERSION or cached_version != version:
+            return False
+        with self.lock:
+            self.next_id = next_id
+            self.ids = ids
+            self.lower = dict(zip(ids, lower))
+            self.sizes = dict(zip(ids, sizes))
+            self.postings = postings
+            self.short = {item_id for item_id, size in self.sizes.items() if not size}
+        return True
+
+    def _add(self, item_id, text):
+        lower = text.lower()
+        self.lower[item_id] = lower
+        grams = trigrams(lower)
+        self.sizes[item_id] = len(grams)
+        if not grams:
+            self.short.add(item_id)
+        for gram in grams:
+            ids = self.posting(gram)
+            if ids is None:
+                self.postings[gram] = ids = set()
+            ids.add(item_id)
+
+    def _discard(self, item_id):
+        lower = self.lower.pop(item_id)
+        del self.sizes[item_id]
+        self.short.discard(item_id)
+        for gram in trigrams(lower):
+            ids = self.posting(gram)
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[gram]
+
+    def matching_ids(self, query):
+        """Return the ids of all items containing the lowercase `query`."""
+        if len(query) >= 3:
+            # Intersect the posting sets, smallest first, then confirm the
+            # trigrams really appear next to each other
+            postings = sorted((self.posting(gram) or set() for gram in trigrams(query)), key=len)
+            found = postings[0].intersection(*postings[1:])
+            if len(query) > 3:
+                found = {item_id for item_id in found if query in self.lower[item_id]}
+            return found
+
+        # One or two characters: any trigram containing the query will do
+        found = {item_id for item_id in self.short if query in self.lower[item_id]}
+        for gram in self.postings:
+            if query in gram:
+                found |= self.posting(gram)
+        return found
+
+    def pair_ids(self, pairs):
+        """Return {pair: ids of the items containing it} for two-letter `pairs`.
+
+        Like matching_ids() for a two-letter query, but all pairs are
+        gathered in one pass over the trigrams.
+        """
+        found = {pair: {item_id for item_id in self.short if pair in self.lower[item_id]} for pair in pairs}
+        for gram in self.postings:
+            for pair in {gram[:2], gram[1:]}:
+                if pair in found:
+                    found[pair] |= self.posting(gram)
+        return found
+
+    def search(self, search_text):
+        """Return item ids: prefix matches, then other matches, then the rest."""
+        query = search_text.lower()
+        with self.lock:
+            if not query:
+                return list(self.ids)
+
+            starts, contains = [], []
+            indices = sorted(bisect.bisect_left(self.ids, item_id) for item_id in self.matching_ids(query))
+            for index in indices:
+                item_id = self.ids[index]
+                if self.lower[item_id].startswith(query):
+                    starts.append(item_id)
+                else:
+                    contains.append(item_id)
+            return SearchResult(starts + contains, indices, self.ids)
+
+    def fuzzy_search(self, search_text, limit=FUZZY_LIMIT):
+        """Return the ids of the best `limit` matches, tolerating typos."""
+        query = search_text.lower()
+        with self.lock:
+            if not query:
+                # Nothing to match yet; show everything, as search() does
+                return list(self.ids)
+            grams = trigrams(query)
+            if not grams:
+                # Too short to rank by trigrams; use plain substring matches
+                return sorted(self.matching_ids(query))[:limit]
+            overlaps = collections.Counter()
+            if len(query) <= FUZZY_SHORT_QUERY:
+                for ids in self.pair_ids(letter_pairs(query)).values():
+                    overlaps.update(ids)
+            else:
+                for gram in grams:
+                    overlaps.update(self.posting(gram) or ())
+            return rank_fuzzy(query, overlaps, self.lower.get, limit, self.sizes)
+
+class MemoryLibrary:
+    """All items held in memory, searched with SearchIndex.
+
+    Changes are saved through a JournalStore. Items are addressed by the
+    stable ids of the search index, which stay valid while other items are
+    added or deleted.
+
+    The index is built a chunk at a time by load_step(), so the app can
+    paint while a large library loads; until then ids() and searches cover
+    the items indexed so far. With `cache_path`, close() saves the index and
+    the next start loads it instead of rebuilding it, as long as the store
+    has not changed in between.
+    """
+
+    def __init__(self, store, cache_path=None):
+        self.store = store
+        self.items = store.load()
+        self.index = SearchIndex()
+        self.cache_path = cache_path
+        self.loaded = 0  # number of items indexed so far
+        self.loading = True
+        self.cached = False  # the index matches the cache file
+        self.digests = None  # digest -> number of items with it, built by has_digest()
+
+    def __len__(self):
+        return len(self.items)
+
+    @timings.timed("load_step")
+    def load_step(self, count=LOAD_CHUNK):
+        """Index up to `count` more items; returns True once all are indexed."""
+        if self.loaded == 0 and self.items and self.cache_path:
+            if self.index.load(self.cache_path, self.store.version()):
+                self.loaded = len(self.items)
+                self.cached = True
+        for entry in self.items[self.loaded:self.loaded + count]:
+            self.index.append(self.store.text(entry))
+        self.loaded = min(len(self.items), self.loaded + count)
+        self.loading = self.loaded < len(self.items)
+        return not self.loading
+
+    def finish_loading(self):
+        """Index all remaining items; changes need the complete index."""
+        if self.loading:
+            self.load_step(len(self.items))
+
+    def ids(self):
+        """Return the ids of all items in list order."""
+        return self.index.search("")
+
+    def position(self, item_id):
+        return bisect.bisect_left(self.index.ids, item_id)
+
+    def text(self, item_id):
+        return self.store.text(self.items[self.position(item_id)])
+
+    def has_digest(self, digest):
+        """Whether an item has the text_digest() `digest`.
+
+        The digests are computed on first use and kept up to date by every
+        change, so checking for duplicates does not read the library.
+        """
+        if self.digests is None:
+            self.digests = collections.Counter(text_digest(text) for text in self.texts())
+        return self.digests.get(digest, 0) > 0
+
+    def count_digest(self, text, change):
+        if self.digests is not None:
+            digest = text_digest(text)
+            self.digests[digest] += change
+            if not self.digests[digest]:
+                del self.digests[digest]
+
+    def add(self, text):
+        """Append an item and return its id."""
+        self.finish_loading()
+        self.cached = False
+        self.items.append(text)
+        self.store.add(text)
+        self.count_digest(text, 1)
+        return self.index.append(text)
+
+    def add_many(self, texts):
+        """Append several items, saving them in one journal write."""
+        self.finish_loading()
+        self.cached = False
+        self.items.extend(texts)
+        self.store.add_many(texts)
+        for text in texts:
+            self.index.append(text)
+            self.count_digest(text, 1)
+
+    def texts(self):
+        """Yield the texts of all items in list order."""
+        for entry in list(self.items):
+            yield self.store.text(entry)
+
+    def edit(self, item_id, text):
+        self.finish_loading()
+        self.cached = False
+        index = self.position(item_id)
+        self.count_digest(self.store.text(self.items[index]), -1)
+        self.count_digest(text, 1)
+        self.items[index] = text
+        self.index.replace(index, text)
+        self.store.edit(index, text)
+
+    def delete(self, item_id):
+        self.finish_loading()
+        self.cached = False
+        index = self.position(item_id)
+        self.count_digest(self.store.text(self.items[index]), -1)
+        del self.items[index]
+        self.index.remove(index)
+        self.store.delete(index)
+
+    def search(self, search_text, fuzzy=False):
+        if fuzzy:
+            return self.index.fuzzy_search(search_text)
+        return self.index.search(search_text)
+
+    def close(self):
+        """Save the index for the next start if it changed, and close the store."""
+        if self.cache_path and not self.cached and not self.loading:
+            self.index.save(self.cache_path, self.store.version())
+        self.store.close()
+
+class PagedIds:
+    """Lazy sequence of item ids read from SQLite one page at a time.
+
+    `query` must select ids in display order; it is run with LIMIT/OFFSET
+    as rows are needed, so only the pages actually shown are read.
+    """
+
+    PAGE_SIZE = 200
+
+    def __init__(self, library, query, params, total, head=()):
+        self.library = library
+        self.query = query + " LIMIT ? OFFSET ?"
+        self.params = tuple(params)
+        self.head = head  # ids shown before the paged rows
+        self.total = len(head) + total
+        self.pages = collections.OrderedDict()
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.total
+        if not 0 <= position < self.total:
+            raise IndexError("result index out of range")
+        if position < len(self.head):
+            return self.head[position]
+        page_number, offset = divmod(position - len(self.head), self.PAGE_SIZE)
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.library.fetch_ids(self.query, self.params + (self.PAGE_SIZE, page_number * self.PAGE_SIZE))
+            self.pages[page_number] = page
+            if len(self.pages) > 8:
+                self.pages.popitem(last=False)
+        return page[offset]
+
+def like_pattern(text):
+    """Escape `text` for use in a LIKE pattern with ESCAPE '\\'."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SQLiteLibrary:
+    """Items in an SQLite database, searched through an FTS5 trigram index.
+
+    Nothing is loaded up front: the list pages in the rows it displays via
+    PagedIds, and add/edit/delete/search are single indexed queries, so
+    startup time and memory do not grow with the library. Items keep their
+    rowid as a stable id. On first use the existing items are imported from
+    `import_items()`. Without FTS5 trigram support, searching falls back to
+    LIKE scans. An indexed column holds the text_digest() of each item, for
+    finding duplicates.
+    """
+
+    def __init__(self, path, import_items=None):
+        # Searches run on the SearchScheduler worker thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.create_function("text_digest", 1, text_digest, deterministic=True)
+        self.lock = threading.Lock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL)")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == 1:
+            # Recreated below to fire only when the text changes, not its digest
+            self.connection.execute("DROP TRIGGER IF EXISTS items_au")
+        try:
+            self.connection.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS items_fts
+                    USING fts5(text, content='items', content_rowid='id', tokenize='trigram');
+                CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+                    INSERT INTO items_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+                    INSERT INTO items_fts(items_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF text ON items BEGIN
+                    INSERT INTO items_fts(items_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO items_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+        if version == 0 and import_items is not None:
+            self.connection.executemany("INSERT INTO items (text) VALUES (?)",
+                                        ((text,) for text in import_items()))
+        if version < 2:
+            # Version 2 adds the digest column, filled in for existing items
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(items)")]
+            if "digest" not in columns:
+                self.connection.execute("ALTER TABLE items ADD COLUMN digest BLOB")
+            self.connection.execute("UPDATE items SET digest = text_digest(text)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS items_digest ON items (digest)")
+            self.connection.execute("PRAGMA user_version = 2")
+            self.connection.commit()
+        self.count = self.connection.execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def __len__(self):
+        return self.count
+
+    def load_step(self, count=LOAD_CHUNK):
+        """Nothing to load up front: SQLite reads items as they are needed."""
+        return True
+
+    def finish_loading(self):
+        pass
+
+    def close(self):
+        self.connection.close()
+
+    def fetch_ids(self, query, params):
+        with self.lock:
+            return [row[0] for row in self.connection.execute(query, params)]
+
+    def ids(self):
+        """Return the ids of all items in insertion order, paged lazily."""
+        return PagedIds(self, "SELECT id FROM items ORDER BY id", (), self.count)
+
+    def text(self, item_id):
+        with self.lock:
+            row = self.connection.execute("SELECT text FROM items WHERE id = ?", (item_id,)).fetchone()
+        return row[0]
+
+    @timings.timed("save_data")
+    def add(self, text):
+        """Append an item and return its id."""
+        with self.lock, self.connection:
+            cursor = self.connection.execute("INSERT INTO items (text, digest) VALUES (?1, text_digest(?1))",
+                                             (text,))
+        self.count += 1
+        return cursor.lastrowid
+
+    @timings.timed("save_data")
+    def add_many(self, texts):
+        """Append several items in one transaction."""
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT INTO items (text, digest) VALUES (?1, text_digest(?1))",
+                                        ((text,) for text in texts))
+        self.count += len(texts)
+
+    def has_digest(self, digest):
+        """Whether an item has the text_digest() `digest`; one index lookup."""
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM items WHERE digest = ? LIMIT 1",
+                                           (digest,)).fetchone() is not None
+
+    def texts(self):
+        """Yield the texts of all items in insertion order, a page at a time."""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT id, text FROM items WHERE id > ? ORDER BY id LIMIT 1000", (last_id,)).fetchall()
+            if not rows:
+                return
+            for last_id, text in rows:
+                yield text
+
+    @timings.timed("save_data")
+    def edit(self, item_id, text):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE items SET text = ?1, digest = text_digest(?1) WHERE id = ?2",
+                                    (text, item_id))
+
+    @timings.timed("save_data")
+    def delete(self, item_id):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        self.count -= 1
+
+    def search(self, search_text, fuzzy=False):
+        """Return item ids: prefix matches, then other matches, then the rest.
+
+        With `fuzzy`, return only the best matches tolerating typos instead.
+        """
+        query = search_text.lower()
+        if fuzzy:
+            return self.fuzzy_search(query)
+        if not query:
+            return self.ids()
+
+        if self.fts and len(query) >= 3:
+            # A quoted phrase matches any substring with the trigram tokenizer
+            matching = "SELECT rowid FROM items_fts WHERE items_fts MATCH ?"
+            params = ('"' + query.replace('"', '""') + '"',)
+        else:
+            matching = "SELECT id FROM items WHERE text LIKE ? ESCAPE '\\'"
+            params = ("%" + like_pattern(query) + "%",)
+
+        matches = self.fetch_ids(
+            f"SELECT id FROM items WHERE id IN ({matching}) "
+            "ORDER BY text NOT LIKE ? ESCAPE '\\', id",
+            params + (like_pattern(query) + "%",))
+        return PagedIds(self, f"SELECT id FROM items WHERE id NOT IN ({matching}) ORDER BY id",
+                        params, self.count - len(matches), head=matches)
+
+    def fuzzy_search(self, query, limit=FUZZY_LIMIT):
+        if not query:
+            # Nothing to match yet; show everything, as search() does
+            return self.ids()
+        grams = trigrams(query)
+        if not grams:
+            # Too short to rank by trigrams; use plain substring matches
+            return self.fetch_ids("SELECT id FROM items WHERE text LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+                                  ("%" + like_pattern(query) + "%", limit))
+        if len(query) <= FUZZY_SHORT_QUERY:
+            # Pairs are too short for the trigram index; count the pairs of
+            # every item in one scan and keep the candidates rank_fuzzy() scores
+            pairs = sorted(letter_pairs(query))
+            overlap = " + ".join(["(text LIKE ? ESCAPE '\\')"] * len(pairs))
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT id, {overlap} AS overlap FROM items WHERE overlap > 0 "
+                    "ORDER BY overlap DESC, length(text) LIMIT ?",
+                    ["%" + like_pattern(pair) + "%" for pair in pairs] + [limit * 3]).fetchall()
+            return rank_fuzzy(query, dict(rows), self.text, limit)
+        if not self.fts:
+            # Without the trigram index, use plain substring matches
+            return self.fetch_ids("SELECT id FROM items WHERE text LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+                                  ("%" + like_pattern(query) + "%", limit))
+        overlaps = collections.Counter()
+        for gram in grams:
+            overlaps.update(self.fetch_ids("SELECT rowid FROM items_fts WHERE items_fts MATCH ?",
+                                           ('"' + gram.replace('"', '""') + '"',)))
+        return rank_fuzzy(query, overlaps, self.text, limit)
+
+class Selection:
+    """Ids of the ticked items, in the order they were ticked.
+
+    A dict serves as an ordered set: ticking, unticking and membership
+    tests are O(1), and the numbering in the Selected Text panel follows
+    insertion order, so nothing is re-sorted or renumbered on untick.
+    """
+
+    def __init__(self):
+        self.order = {}
+
+    def __contains__(self, item_id):
+        return item_id in self.order
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def add(self, item_id):
+        self.order[item_id] = None
+
+    def discard(self, item_id):
+        self.order.pop(item_id, None)
+
+    def clear(self):
+        self.order.clear()
+
+# Added below the numbered items in the Selected Text panel
+SELECTED_FOOTER = "We can submit any document or image in the next query, if required. Please consider this."
+
+def compose_selected_text(texts):
+    """Return the Selected Text panel contents for the selected item texts."""
+    # Add serial numbers to selected items based on selection order
+    numbered_items = [f"{number}. {text}" for number, text in enumerate(texts, 1)]
+    return "\n".join(numbered_items) + "\n" + SELECTED_FOOTER
+
+# File formats for bulk import and export, by file extension
+FILE_FORMATS = {".csv": "csv", ".json": "json", ".jsonl": "jsonl"}
+
+def file_format(path):
+    """Return the import/export format for `path`: text, csv, json or jsonl."""
+    return FILE_FORMATS.get(os.path.splitext(path)[1].lower(), "text")
+
+def read_items(file, format="text"):
+    """Yield snippet texts from an open file.
+
+    "text" has one snippet per line, "csv" one per row (first column),
+    "jsonl" one JSON string or {"text": ...} object per line and "json" a
+    list of those. All but "json" are read as a stream.
+    """
+    if format == "csv":
+        for row in csv.reader(file):
+            if row:
+                yield row[0]
+    elif format in ("json", "jsonl"):
+        entries = json.load(file) if format == "json" else (json.loads(line) for line in file if line.strip())
+        for entry in entries:
+            yield entry["text"] if isinstance(entry, dict) else entry
+    else:
+        yield from file
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+class ClipboardHistory:
+    """Bounded ring of recent clipboard captures, kept apart from the items.
+
+    Holds at most `max_entries` texts and `max_chars` characters in all,
+    dropping the oldest captures first, so memory stays constant however
+    long the app runs. Texts are recognised by digest, so repeats are
+    skipped without comparing strings.
+    """
+
+    def __init__(self, max_entries=100, max_chars=100_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.entries = collections.deque()  # (digest, text), oldest first
+        self.digests = set()
+        self.chars = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def texts(self):
+        """Return the captured texts, newest first."""
+        return [text for digest, text in reversed(self.entries)]
+
+    def add(self, text, digest=None):
+        """Store a capture; returns False if it is already held or too big."""
+        if len(text) > self.max_chars:
+            return False
+        if digest is None:
+            digest = text_digest(text)
+        if digest in self.digests:
+            return False
+        self.entries.append((digest, text))
+        self.digests.add(digest)
+        self.chars += len(text)
+        while len(self.entries) > self.max_entries or self.chars > self.max_chars:
+            old_digest, old_text = self.entries.popleft()
+            self.digests.discard(old_digest)
+            self.chars -= len(old_text)
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        self.digests.clear()
+        self.chars = 0
+
+class ClipboardWatcher:
+    """Feeds new clipboard contents into a ClipboardHistory.
+
+    `source` is any callable returning the current clipboard text, or None
+    when there is none, so tests can drive it with a fake. Each poll hashes
+    the text once (never more than `history.max_chars` characters) and
+    compares digests only.
+    """
+
+    def __init__(self, source, history):
+        self.source = source
+        self.history = history
+        self.last_digest = None
+
+    def poll(self):
+        """Check the clipboard once; returns True if a new text was stored."""
+        text = self.source()
+        if not text or not text.strip() or len(text) > self.history.max_chars:
+            return False
+        digest = text_digest(text)
+        if digest == self.last_digest:
+            return False
+        self.last_digest = digest
+        return self.history.add(text, digest)
+
+def import_items(library, texts):
+    """Add the new snippets among `texts` to `library` in one batch.
+
+    Texts are stripped; empty ones and ones already in the library (or
+    earlier in `texts`) are skipped, by digest rather than comparing
+    strings: the library keeps the digests of its items, so an import
+    costs the same however large the library is. Returns (number added,
+    number of duplicates).
+    """
+    seen = set()  # digests of the texts added by this call
+    new_texts = []
+    duplicates = 0
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        digest = text_digest(text)
+        if digest in seen or library.has_digest(digest):
+            duplicates += 1
+            continue
+        seen.add(digest)
+        new_texts.append(text)
+    if new_texts:
+        library.add_many(new_texts)
+    return len(new_texts), duplicates
+
+def export_items(library, file, format="text"):
+    """Write every snippet of `library` to an open file; returns the count.
+
+    Formats are those of read_items. In "text" each snippet takes one
+    line, so the lines of multi-line snippets are joined with spaces.
+    """
+    count = 0
+    writer = csv.writer(file) if format == "csv" else None
+    if format == "json":
+        file.write("[")
+    for text in library.texts():
+        if format == "csv":
+            writer.writerow([text])
+        elif format == "json":
+            file.write(("," if count else "") + "\n  " + json.dumps(text))
+        elif format == "jsonl":
+            file.write(json.dumps(text) + "\n")
+        else:
+            file.write(" ".join(text.splitlines()) + "\n")
+        count += 1
+    if format == "json":
+        file.write("\n]\n")
+    return count
+
+@timings.timed("load_data")
+def open_library(backend=BACKEND, directory=""):
+    """Open the snippet library in `directory` with the given storage backend."""
+    def journal_store():
+        return JournalStore(os.path.join(directory, SNAPSHOT_FILE), os.path.join(directory, JOURNAL_FILE),
+                            legacy_path=os.path.join(directory, DATA_FILE))
+
+    def journal_texts():
+        # Only read to fill a new database; close it so that no journal
+        # stays open and any compaction it started has finished
+        store = journal_store()
+        try:
+            return store.texts()
+        finally:
+            store.close()
+
+    if backend == "sqlite":
+        return SQLiteLibrary(os.path.join(directory, DATABASE_FILE), import_items=journal_texts)
+    return MemoryLibrary(journal_store(), cache_path=os.path.join(directory, INDEX_CACHE_FILE))
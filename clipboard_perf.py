@@ -0,0 +1,86 @@
+"""Optional timing instrumentation for the Clipboard Data App.
+
+Functions decorated with `timings.timed(name)` record how long each call
+takes into a rolling histogram per name. Recording is off unless
+CLIPBOARD_PERF=1 is set (which also shows the overlay in the app) or
+CLIPBOARD_PERF_LOG names a file, to which every timed call is appended as
+one JSON line. Ctrl+Shift+P in the app turns recording and the overlay on
+and off at any time.
+"""
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+class RollingHistogram:
+    """The most recent durations of one operation, in milliseconds."""
+
+    def __init__(self, size=1000):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, milliseconds):
+        self.samples.append(milliseconds)
+        self.count += 1
+
+    def percentiles(self, *points):
+        """Return the given percentiles (0-100) of the recent samples."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [0.0 for point in points]
+        return [ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] for point in points]
+
+class Timings:
+    """Per-operation rolling histograms plus an optional JSON-lines log."""
+
+    def __init__(self, enabled=False, log_path=None, size=1000):
+        self.enabled = enabled or bool(log_path)
+        self.size = size
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def record(self, name, milliseconds):
+        """Add one duration; safe to call from any thread."""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                self.histograms[name] = histogram = RollingHistogram(self.size)
+            histogram.add(milliseconds)
+            if self.log is not None:
+                self.log.write(json.dumps({"time": time.time(), "operation": name,
+                                           "ms": round(milliseconds, 3)}) + "\n")
+                self.log.flush()
+
+    def timed(self, name):
+        """Decorator recording the duration of each call under `name`."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """Return {name: (calls, p50, p95, p99)} with times in milliseconds."""
+        with self.lock:
+            return {name: (histogram.count, *histogram.percentiles(50, 95, 99))
+                    for name, histogram in sorted(self.histograms.items())}
+
+    def report(self):
+        """Return the summary as a small fixed-width table."""
+        lines = [f"{'operation':<20}{'calls':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for name, (calls, p50, p95, p99) in self.summary().items():
+            lines.append(f"{name:<20}{calls:>7}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+        return "\n".join(lines)
+
+timings = Timings(enabled=os.environ.get("CLIPBOARD_PERF") == "1",
+                  log_path=os.environ.get("CLIPBOARD_PERF_LOG"))
@@ -0,0 +1,270 @@
+"""Tests for the snippet library of clipboard_core."""
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clipboard_core
+from clipboard_core import (DATA_FILE, JOURNAL_FILE, SNAPSHOT_FILE, ClipboardHistory, ClipboardWatcher, JournalStore,
+                            SearchIndex, SearchResult, Selection, SQLiteLibrary, compose_selected_text, import_items,
+                            open_library, substring_distance, text_digest)
+
+def make_library(directory, backend, texts):
+    library = open_library(backend, str(directory))
+    library.finish_loading()
+    for text in texts:
+        library.add(text)
+    return library
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_fuzzy_search_with_empty_query_shows_everything(tmp_path, backend):
+    library = make_library(tmp_path, backend, ["Anesthesia note", "OT notes", "Discharge summary"])
+    try:
+        assert [library.text(item_id) for item_id in library.search("", fuzzy=True)] == \
+            [library.text(item_id) for item_id in library.search("")]
+        assert len(library.search("", fuzzy=True)) == 3
+    finally:
+        library.close()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_import_skips_duplicates_after_changes(tmp_path, backend):
+    library = make_library(tmp_path, backend, ["alpha", "beta"])
+    try:
+        assert import_items(library, ["alpha", "gamma", "gamma", " "]) == (1, 2)
+        ids = list(library.ids())
+        library.edit(ids[0], "delta")
+        library.delete(ids[1])
+        # alpha and beta are gone, delta and gamma are there
+        assert import_items(library, ["alpha", "beta", "delta", "gamma"]) == (2, 2)
+        assert sorted(library.texts()) == ["alpha", "beta", "delta", "gamma"]
+    finally:
+        library.close()
+
+def test_sqlite_library_adds_digests_to_an_older_database(tmp_path):
+    path = str(tmp_path / "clipboard_data.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL)")
+    connection.execute("INSERT INTO items (text) VALUES ('alpha')")
+    connection.execute("PRAGMA user_version = 1")
+    connection.commit()
+    connection.close()
+
+    library = SQLiteLibrary(path)
+    try:
+        assert library.has_digest(text_digest("alpha"))
+        assert import_items(library, ["alpha", "beta"]) == (1, 1)
+    finally:
+        library.close()
+
+@pytest.mark.parametrize("lines", [[], ['"first"', '"second\\nline"']])
+def test_journal_store_reads_older_json_snapshot(tmp_path, lines):
+    snapshot_path = tmp_path / SNAPSHOT_FILE
+    snapshot_path.write_text("\n".join(['{"seq": 5, "count": %d}' % len(lines)] + lines) + "\n", encoding="utf-8")
+    store = JournalStore(str(snapshot_path), str(tmp_path / JOURNAL_FILE))
+    try:
+        texts = store.texts()
+    finally:
+        store.close()
+
+    assert texts == [json.loads(line) for line in lines]
+
+def test_sqlite_library_closes_the_journal_it_imports(tmp_path, monkeypatch):
+    (tmp_path / DATA_FILE).write_text("first\nsecond\n")
+    stores = []
+    class RecordingStore(JournalStore):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stores.append(self)
+    monkeypatch.setattr(clipboard_core, "JournalStore", RecordingStore)
+
+    library = open_library("sqlite", str(tmp_path))
+    library.finish_loading()
+
+    assert list(library.texts()) == ["first", "second"]
+    assert len(stores) == 1
+    assert stores[0].journal.closed and stores[0].records.file.closed
+    library.close()
+
+def test_clipboard_history_drops_the_oldest_captures():
+    history = ClipboardHistory(max_entries=3, max_chars=10)
+    for text in ("a", "b", "c", "d"):
+        assert history.add(text)
+    assert history.texts() == ["d", "c", "b"]
+
+    assert not history.add("c")
+    assert not history.add("x" * 11)
+    assert history.add("12345678")
+    assert history.texts() == ["12345678", "d", "c"]
+    assert history.chars == 10
+
+    # A dropped capture is new again
+    assert history.add("b")
+    assert history.texts() == ["b", "12345678", "d"]
+    history.clear()
+    assert len(history) == 0 and history.chars == 0
+
+def test_clipboard_watcher_stores_each_new_text_once():
+    clipboard = iter(["first", "first", None, "  ", "second", "first", "x" * 200])
+    history = ClipboardHistory(max_chars=100)
+    watcher = ClipboardWatcher(lambda: next(clipboard), history)
+
+    stored = [watcher.poll() for _ in range(7)]
+
+    assert stored == [True, False, False, False, True, False, False]
+    assert history.texts() == ["second", "first"]
+
+def open_store(directory, **kwargs):
+    return JournalStore(str(directory / SNAPSHOT_FILE), str(directory / JOURNAL_FILE), **kwargs)
+
+def test_journal_store_replays_mutations_and_drops_a_torn_record(tmp_path):
+    store = open_store(tmp_path)
+    items = store.load()
+    for text in ("one", "two\nlines", "three"):
+        items.append(text)
+        store.add(text)
+    items[0] = "ONE"
+    store.edit(0, "ONE")
+    del items[2]
+    store.delete(2)
+    store.close()
+    with open(tmp_path / JOURNAL_FILE, "ab") as journal:
+        journal.write(b'{"op": "add", "te')
+
+    store = open_store(tmp_path)
+    assert store.texts() == ["ONE", "two\nlines"]
+    store.add("four")
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.texts() == ["ONE", "two\nlines", "four"]
+    store.close()
+
+def test_journal_store_compacts_into_a_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_bytes=500)
+    items = store.load()
+    for number in range(50):
+        items.append(f"item {number}")
+        store.add(f"item {number}")
+    store.close()
+
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) <= 500
+    assert not os.path.exists(str(tmp_path / JOURNAL_FILE) + ".old")
+    store = open_store(tmp_path, compact_bytes=500)
+    assert store.texts() == [f"item {number}" for number in range(50)]
+    # Most of the items now come from the snapshot rather than the journal
+    assert store.records.seq > 40
+    store.close()
+
+def journal_lines(*records):
+    return b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+
+def test_journal_store_applies_records_copied_by_a_crashed_compaction_once(tmp_path):
+    rotated = journal_lines({"op": "add", "text": "a", "seq": 1}, {"op": "add", "text": "b", "seq": 2},
+                            {"op": "add", "text": "c", "seq": 3})
+    journal = journal_lines({"op": "delete", "index": 0, "seq": 4}, {"op": "add", "text": "d", "seq": 5},
+                            {"op": "add", "text": "e", "seq": 6})
+    # compact() was appending the journal to journal.old when the app died
+    (tmp_path / (JOURNAL_FILE + ".old")).write_bytes(rotated + journal[:len(journal) - 10])
+    (tmp_path / JOURNAL_FILE).write_bytes(journal)
+
+    store = open_store(tmp_path)
+    items = store.load()
+    assert [store.text(entry) for entry in items] == ["b", "c", "d", "e"]
+    items.append("f")
+    store.add("f")
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.texts() == ["b", "c", "d", "e", "f"]
+    store.close()
+
+FUZZY_ITEMS = ["UPCMI discharge", "HPE report", "Anesthesia note", "Operation notes", "Help desk",
+               "Epidural consent", "MRI doctor"]
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+@pytest.mark.parametrize("query, expected", [
+    ("UPMCI", "UPCMI discharge"),
+    ("HEP", "HPE report"),
+    ("hpe reprot", "HPE report"),
+    ("Anestesia note", "Anesthesia note"),
+    ("Ansethesia", "Anesthesia note"),
+])
+def test_fuzzy_search_finds_typos(tmp_path, backend, query, expected):
+    library = make_library(tmp_path, backend, FUZZY_ITEMS)
+
+    found = [library.text(item_id) for item_id in library.search(query, fuzzy=True)]
+
+    assert found[0] == expected
+    library.close()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_fuzzy_search_drops_items_too_far_from_the_query(tmp_path, backend):
+    library = make_library(tmp_path, backend, FUZZY_ITEMS)
+
+    assert list(library.search("xyzzy", fuzzy=True)) == []
+    library.close()
+
+def test_substring_distance_counts_a_swap_as_one_edit():
+    assert substring_distance("upmci", "the upcmi form") == 1
+    assert substring_distance("hep", "hpe report") == 1
+    assert substring_distance("note", "anesthesia note") == 0
+    assert substring_distance("abcd", "xdcbax") == 3
+
+def expected_order(index, query):
+    """Ids in display order worked out the slow way: prefix, substring, rest."""
+    texts = [(item_id, index.lower[item_id]) for item_id in index.ids]
+    starts = [item_id for item_id, text in texts if text.startswith(query)]
+    contains = [item_id for item_id, text in texts if query in text and not text.startswith(query)]
+    rest = [item_id for item_id, text in texts if query not in text]
+    return starts + contains + rest
+
+def test_search_index_orders_prefix_then_substring_then_rest():
+    index = SearchIndex(["Anesthesia note", "OT notes", "Discharge summary", "notes on PAC", "no", "PAC"])
+    index.replace(0, "Anaesthesia notes")
+    index.remove(2)
+    index.append("Note to self")
+
+    for query in ("not", "note", "no", "n", "pac", "summary", "xyz", ""):
+        assert list(index.search(query)) == expected_order(index, query), query
+    assert index.ids == [0, 1, 3, 4, 5, 6]
+
+def test_search_result_positions():
+    # Items 10..15 where 12 and 14 matched, 14 as a prefix match
+    result = SearchResult([14, 12], [2, 4], [10, 11, 12, 13, 14, 15])
+
+    assert len(result) == 6
+    assert [result[position] for position in range(6)] == [14, 12, 10, 11, 13, 15]
+    assert result[-1] == 15
+    with pytest.raises(IndexError):
+        result[6]
+
+def test_selection_keeps_tick_order_across_untick_and_retick():
+    selection = Selection()
+    for item_id in (5, 2, 9):
+        selection.add(item_id)
+    selection.discard(2)
+    selection.add(5)  # already ticked; keeps its place
+    selection.add(2)
+    selection.discard(7)
+
+    assert list(selection) == [5, 9, 2]
+    assert 2 in selection and 7 not in selection and len(selection) == 3
+    selection.clear()
+    assert list(selection) == []
+
+def test_selection_tells_apart_items_with_the_same_text(tmp_path):
+    library = make_library(tmp_path, "memory", ["Same", "Other", "Same"])
+    first, other, second = library.ids()
+    selection = Selection()
+    for item_id in (second, other, first):
+        selection.add(item_id)
+    selection.discard(other)
+
+    assert compose_selected_text(library.text(item_id) for item_id in selection).splitlines()[:2] == \
+        ["1. Same", "2. Same"]
+    assert list(selection) == [second, first]
+    library.close()
@@ -0,0 +1,239 @@
+"""Tests for the case folder build of pdf_maker_core."""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PDF Maker"))
+
+from PIL import Image
+
+import pdf_maker_core
+
+def make_image(path, color=(200, 120, 80), size=(400, 500)):
+    Image.new("RGB", size, color).save(path)
+
+def test_category_without_convertible_files_is_skipped(tmp_path):
+    (tmp_path / "CT_notes.docx").write_bytes(b"not a PDF")
+    make_image(tmp_path / "PAC_1.jpg")
+
+    summary = pdf_maker_core.build_folder(str(tmp_path), jobs=1)
+
+    assert summary == {"built": ["PAC.pdf"], "up_to_date": [], "failed": []}
+    assert not (tmp_path / "CT.pdf").exists()
+    assert "CT.pdf" not in pdf_maker_core.load_manifest(str(tmp_path))["outputs"]
+
+def noisy_page(seed, size=(1240, 1754)):
+    return Image.merge("RGB", [Image.effect_noise(size, 60 + seed)] * 3)
+
+def test_compress_image_keeps_pages_readable():
+    data, size, passes = pdf_maker_core.compress_image(noisy_page(0), budget=20 * 1024)
+
+    assert max(size) >= pdf_maker_core.MIN_IMAGE_SIZE
+    assert len(data) > 20 * 1024
+
+def test_compress_pdf_warns_rather_than_shrink_below_floor(tmp_path, capsys):
+    pdf_path = str(tmp_path / "CT.pdf")
+    pages = [noisy_page(seed) for seed in range(4)]
+    pages[0].save(pdf_path, "PDF", save_all=True, append_images=pages[1:], quality=95)
+
+    before, after = pdf_maker_core.compress_pdf(pdf_path, max_size_kb=100)
+
+    assert after > 100 * 1024
+    assert "Warning: Could not compress" in capsys.readouterr().out
+    images = pdf_maker_core.page_image_objects(pdf_maker_core.PdfReader(pdf_path))
+    assert len(images) == 4
+    assert all(max(image["/Width"], image["/Height"]) >= pdf_maker_core.MIN_IMAGE_SIZE for image in images)
+
+def test_compress_pdf_leaves_only_the_smallest_attempt(tmp_path):
+    pdf_path = str(tmp_path / "CT.pdf")
+    pages = [noisy_page(seed) for seed in range(2)]
+    pages[0].save(pdf_path, "PDF", save_all=True, append_images=pages[1:], quality=95)
+
+    before, after = pdf_maker_core.compress_pdf(pdf_path, max_size_kb=600)
+
+    assert after < before
+    assert os.path.getsize(pdf_path) == after
+    assert os.listdir(tmp_path) == ["CT.pdf"]
+
+def test_run_case_builds_within_its_memory_limit(tmp_path, monkeypatch):
+    limits = []
+    def build_folder(*args):
+        limits.append(args[6])
+        return {"built": [], "up_to_date": [], "failed": []}
+    monkeypatch.setattr(pdf_maker_core, "build_folder", build_folder)
+
+    result = pdf_maker_core.run_case(str(tmp_path), False, 1, False, pdf_maker_core.SEARCH_STRINGS,
+                                     pdf_maker_core.DEFAULT_COMPOSITES, 64 * 1024 * 1024)
+
+    assert result["error"] is None
+    assert limits == [64 * 1024 * 1024]
+
+def test_batch_streams_cases_larger_than_their_share(tmp_path):
+    for case in ("Case1", "Case2"):
+        os.mkdir(tmp_path / case)
+        for index in range(2):
+            make_image(tmp_path / case / f"PAC_{index}.jpg", size=(1240, 1754))
+
+    problems = pdf_maker_core.build_batch(str(tmp_path), jobs=2, cases=2, memory_limit=1024 * 1024)
+
+    assert problems == 0
+    for case in ("Case1", "Case2"):
+        reader = pdf_maker_core.PdfReader(str(tmp_path / case / "PAC.pdf"))
+        assert len(reader.pages) == 2
+
+def build_quietly(folder, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return pdf_maker_core.build_folder(str(folder), jobs=1, **kwargs)
+
+def test_build_folder_rebuilds_only_changed_outputs(tmp_path):
+    for name in ("PAC_1.jpg", "OTNotes_1.jpg", "CT_1.jpg"):
+        make_image(tmp_path / name)
+    assert sorted(build_quietly(tmp_path)["built"]) == ["CT.pdf", "OTNotes.pdf", "OperationDocument.pdf", "PAC.pdf"]
+
+    summary = build_quietly(tmp_path)
+    assert summary["built"] == []
+    assert sorted(summary["up_to_date"]) == ["CT.pdf", "OTNotes.pdf", "OperationDocument.pdf", "PAC.pdf"]
+
+    # A changed file rebuilds its category and the composites made from it
+    make_image(tmp_path / "PAC_1.jpg", color=(10, 20, 30))
+    assert sorted(build_quietly(tmp_path)["built"]) == ["OperationDocument.pdf", "PAC.pdf"]
+
+    # So does a new file, and an output that was removed is built again
+    make_image(tmp_path / "CT_2.jpg")
+    os.remove(tmp_path / "OTNotes.pdf")
+    assert sorted(build_quietly(tmp_path)["built"]) == ["CT.pdf", "OTNotes.pdf", "OperationDocument.pdf"]
+    assert len(pdf_maker_core.PdfReader(str(tmp_path / "CT.pdf")).pages) == 2
+
+    # A removed file rebuilds its category without it
+    os.remove(tmp_path / "CT_2.jpg")
+    assert build_quietly(tmp_path)["built"] == ["CT.pdf"]
+    assert len(pdf_maker_core.PdfReader(str(tmp_path / "CT.pdf")).pages) == 1
+
+def test_build_folder_full_and_compress_rebuild_everything(tmp_path):
+    for name in ("PAC_1.jpg", "CT_1.jpg"):
+        make_image(tmp_path / name)
+    build_quietly(tmp_path)
+
+    assert sorted(build_quietly(tmp_path, full=True)["built"]) == ["CT.pdf", "PAC.pdf"]
+    # Outputs built without compression are stale for the compressing script
+    assert sorted(build_quietly(tmp_path, compress=True)["built"]) == ["CT.pdf", "PAC.pdf"]
+    assert build_quietly(tmp_path, compress=True)["built"] == []
+
+def test_main_returns_a_failing_status_for_problems(tmp_path):
+    make_image(tmp_path / "PAC_1.jpg")
+    (tmp_path / "CT_broken.png").write_bytes(b"not an image")
+    (tmp_path / "CT_1.jpg").write_bytes((tmp_path / "PAC_1.jpg").read_bytes())
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert pdf_maker_core.main(str(tmp_path), argv=["--jobs", "1"]) == 1
+        os.remove(tmp_path / "CT_broken.png")
+        assert pdf_maker_core.main(str(tmp_path), argv=["--jobs", "1"]) == 0
+        assert pdf_maker_core.main(str(tmp_path / "missing"), argv=[]) == 1
+
+def test_category_whose_every_file_fails_is_reported(tmp_path):
+    make_image(tmp_path / "PAC_1.jpg")
+    (tmp_path / "CT_broken.png").write_bytes(b"not an image")
+
+    summary = build_quietly(tmp_path)
+
+    assert summary == {"built": ["PAC.pdf"], "up_to_date": [], "failed": ["CT.pdf"]}
+    assert not (tmp_path / "CT.pdf").exists()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert pdf_maker_core.main(str(tmp_path), argv=["--jobs", "1"]) == 1
+
+def image_data(path):
+    reader = pdf_maker_core.PdfReader(str(path))
+    return [image.get_data() for image in pdf_maker_core.page_image_objects(reader)]
+
+def test_streamed_composite_has_the_pages_of_its_sources(tmp_path):
+    for name in ("OTNotes_1.jpg", "OTNotes_2.jpg", "PAC_1.jpg"):
+        make_image(tmp_path / name, color=(len(name) * 9, 120, 80))
+    # Leftover of a streamed build that was stopped
+    os.mkdir(tmp_path / pdf_maker_core.STATE_DIR)
+    os.mkdir(tmp_path / pdf_maker_core.STATE_DIR / "tmpspill")
+
+    summary = build_quietly(tmp_path, memory_limit=64 * 1024 * 1024)
+
+    assert "OperationDocument.pdf" in summary["built"]
+    assert image_data(tmp_path / "OperationDocument.pdf") == \
+        image_data(tmp_path / "OTNotes.pdf") + image_data(tmp_path / "PAC.pdf")
+    assert not [entry for entry in os.scandir(tmp_path / pdf_maker_core.STATE_DIR) if entry.is_dir()]
+
+def test_compress_pdf_shrinks_images_when_the_rest_is_over_budget(tmp_path, capsys):
+    pdf_path = str(tmp_path / "CT.pdf")
+    pages = [noisy_page(seed) for seed in range(2)]
+    pages[0].save(pdf_path, "PDF", save_all=True, append_images=pages[1:], quality=95)
+    # A large content stream, kept as it is, that alone exceeds the budget
+    writer = pdf_maker_core.PdfWriter()
+    for page in pdf_maker_core.PdfReader(pdf_path).pages:
+        writer.add_page(page)
+    layer = pdf_maker_core.DecodedStreamObject()
+    layer.set_data(os.urandom(200 * 1024).hex().encode())
+    writer.pages[0][pdf_maker_core.NameObject("/Contents")] = writer._add_object(layer)
+    writer.write(pdf_path)
+    images_before = sum(len(image._data) for image in pdf_maker_core.page_image_objects(
+        pdf_maker_core.PdfReader(pdf_path)))
+
+    before, after = pdf_maker_core.compress_pdf(pdf_path, max_size_kb=300)
+
+    assert after < before
+    assert "Warning: Could not compress" in capsys.readouterr().out
+    images = pdf_maker_core.page_image_objects(pdf_maker_core.PdfReader(pdf_path))
+    assert sum(len(image._data) for image in images) < images_before / 2
+    assert all(max(image["/Width"], image["/Height"]) >= pdf_maker_core.MIN_IMAGE_SIZE for image in images)
+
+@pytest.mark.parametrize("categories", [["CT", "PostCT", "MRI", "PostMRI"], ["PostMRI", "MRI", "PostCT", "CT"]])
+def test_categorizer_prefers_the_longest_name_whatever_the_order(categories):
+    categorizer = pdf_maker_core.Categorizer(categories)
+
+    assert categorizer.categorize("PostCT_scan.jpg") == "PostCT"
+    assert categorizer.categorize("CT_scan.jpg") == "CT"
+    assert categorizer.categorize("MRI_doctor.pdf") == "MRI"
+    assert categorizer.categorize("postmri_2.png") == "PostMRI"
+    assert categorizer.categorize("notes.txt") is None
+
+def test_categorizer_keeps_list_order_for_names_of_equal_length():
+    assert pdf_maker_core.Categorizer(["PAC", "ICP"]).categorize("PAC_ICP.jpg") == "PAC"
+    assert pdf_maker_core.Categorizer(["ICP", "PAC"]).categorize("PAC_ICP.jpg") == "ICP"
+
+def test_load_composites_reads_rules(tmp_path):
+    path = tmp_path / "composites.txt"
+    path.write_text("# comment\n\nOperationDocument: OTNotes, PAC\nClaimPack: OperationDocument , CT? \n",
+                    encoding="utf-8")
+
+    assert pdf_maker_core.load_composites(str(path)) == {"OperationDocument": ["OTNotes", "PAC"],
+                                                         "ClaimPack": ["OperationDocument", "CT?"]}
+    path.write_text("OperationDocument OTNotes\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="line 1"):
+        pdf_maker_core.load_composites(str(path))
+
+@pytest.mark.parametrize("composites, message", [
+    ({"Pack": ["OTNotes", "Unknown"]}, "neither a category nor a composite"),
+    ({"CT": ["OTNotes", "PAC"]}, "name of a category"),
+    ({"First": ["Second", "PAC"], "Second": ["First?"]}, "made of each other"),
+])
+def test_composite_order_rejects_bad_rules(composites, message):
+    with pytest.raises(ValueError, match=message):
+        pdf_maker_core.composite_order(composites, pdf_maker_core.SEARCH_STRINGS)
+
+def test_composite_made_of_a_composite(tmp_path):
+    composites = {"ClaimPack": ["OperationDocument", "CT?", "MRI?"], "OperationDocument": ["OTNotes", "PAC"]}
+    assert pdf_maker_core.composite_order(composites, pdf_maker_core.SEARCH_STRINGS) == \
+        ["OperationDocument", "ClaimPack"]
+    for index, name in enumerate(("OTNotes_1.jpg", "PAC_1.jpg", "CT_1.jpg")):
+        make_image(tmp_path / name, color=(index * 80, 120, 80))
+
+    summary = build_quietly(tmp_path, composites=composites)
+
+    assert sorted(summary["built"]) == ["CT.pdf", "ClaimPack.pdf", "OTNotes.pdf", "OperationDocument.pdf", "PAC.pdf"]
+    # The missing optional MRI is left out
+    assert image_data(tmp_path / "ClaimPack.pdf") == \
+        image_data(tmp_path / "OTNotes.pdf") + image_data(tmp_path / "PAC.pdf") + image_data(tmp_path / "CT.pdf")
+
+    # Without a required source, neither composite is built
+    os.remove(tmp_path / "PAC_1.jpg")
+    os.remove(tmp_path / "PAC.pdf")
+    summary = build_quietly(tmp_path, composites=composites, full=True)
+    assert sorted(summary["built"]) == ["CT.pdf", "OTNotes.pdf"]